@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+
+import os
+import sqlite3
+import time
+from typing import Optional
+from PyQt5.QtCore import QDateTime, QStandardPaths, Qt
+
+# Entries written per transaction, so a killed run keeps most of its work
+COMMIT_EVERY = 500
+
+class ExifCache:
+    """
+    On-disk cache of the timestamps read from photos.
+
+    Entries are keyed by path, size and modification time, so changed files
+    are read again. New entries and the access times of hits are collected
+    and written in short transactions, so several runs can share the cache
+    at the same time. The least recently used entries are removed when the
+    cache grows beyond the maximum number of entries.
+    """
+
+    def __init__(self, path: str, max_entries: int = 100000):
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        self.max_entries = max_entries
+        self.pending = []
+        self.hits = []
+        self.connection = sqlite3.connect(path, timeout=30)
+        # Readers are not blocked by a writer
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            """CREATE TABLE IF NOT EXISTS photos (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime INTEGER NOT NULL,
+                taken INTEGER,
+                utc_offset INTEGER,
+                accessed REAL NOT NULL
+            )"""
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS photos_accessed ON photos (accessed)")
+
+    @staticmethod
+    def defaultPath() -> str:
+        """
+        Returns the path of the cache in the user cache directory.
+        """
+        cache_dir = QStandardPaths.writableLocation(QStandardPaths.CacheLocation)
+        return os.path.join(cache_dir, "maptools", "exif_cache.sqlite")
+
+    def get(self, path: str, stat: os.stat_result) -> tuple[bool, Optional[QDateTime]]:
+        """
+        Returns if the photo is cached and its timestamp. The timestamp is
+        None for cached photos without one.
+        """
+
+        row = self.connection.execute(
+            "SELECT size, mtime, taken, utc_offset FROM photos WHERE path = ?",
+            (os.path.normcase(os.path.abspath(path)),)
+        ).fetchone()
+
+        if row is None or row[0] != stat.st_size or row[1] != stat.st_mtime_ns:
+            return False, None
+
+        self.hits.append((time.time(), os.path.normcase(os.path.abspath(path))))
+        if len(self.pending) + len(self.hits) >= COMMIT_EVERY:
+            self.commit()
+
+        if row[2] is None:
+            return True, None
+        if row[3] is None:
+            return True, QDateTime.fromMSecsSinceEpoch(row[2])
+        return True, QDateTime.fromMSecsSinceEpoch(row[2], Qt.OffsetFromUTC, row[3])
+
+    def put(self, path: str, stat: os.stat_result, taken: Optional[QDateTime]):
+        """
+        Stores the timestamp of a photo.
+        """
+
+        msecs = None
+        utc_offset = None
+        if taken is not None:
+            msecs = taken.toMSecsSinceEpoch()
+            if taken.timeSpec() == Qt.OffsetFromUTC:
+                utc_offset = taken.offsetFromUtc()
+
+        self.pending.append(
+            (os.path.normcase(os.path.abspath(path)), stat.st_size, stat.st_mtime_ns, msecs, utc_offset, time.time())
+        )
+        if len(self.pending) + len(self.hits) >= COMMIT_EVERY:
+            self.commit()
+
+    def commit(self):
+        """
+        Writes the entries and access times collected so far.
+        """
+        if self.pending:
+            self.connection.executemany("INSERT OR REPLACE INTO photos VALUES (?, ?, ?, ?, ?, ?)", self.pending)
+        if self.hits:
+            self.connection.executemany("UPDATE photos SET accessed = ? WHERE path = ?", self.hits)
+        self.connection.commit()
+        self.pending = []
+        self.hits = []
+
+    def clear(self):
+        """
+        Removes all entries.
+        """
+        self.pending = []
+        self.hits = []
+        self.connection.execute("DELETE FROM photos")
+        self.connection.commit()
+
+    def close(self):
+        """
+        Drops the least recently used entries beyond the maximum number,
+        writes the changes and closes the cache.
+        """
+
+        self.commit()
+        self.connection.execute(
+            "DELETE FROM photos WHERE path NOT IN (SELECT path FROM photos ORDER BY accessed DESC LIMIT ?)",
+            (self.max_entries,)
+        )
+        self.connection.commit()
+        self.connection.close()
@@ -0,0 +1,302 @@
+# -*- coding: utf-8 -*-
+
+import math
+import mmap
+import re
+import struct
+from typing import Any, BinaryIO, Optional
+from PyQt5.QtCore import QDateTime, Qt
+
+# Names of the image file directories returned by read_tags()
+IFD0 = "IFD0"
+EXIF = "Exif"
+GPS = "GPS"
+
+# Tags pointing to the sub directories
+EXIF_POINTER = 0x8769
+GPS_POINTER = 0x8825
+
+# Tags with the time a photo was taken
+DATE_TIME = 0x0132
+DATE_TIME_ORIGINAL = 0x9003
+OFFSET_TIME = 0x9010
+OFFSET_TIME_ORIGINAL = 0x9011
+SUB_SEC_TIME = 0x9290
+SUB_SEC_TIME_ORIGINAL = 0x9291
+
+# Tags of the GPS directory
+GPS_LATITUDE_REF = 0x0001
+GPS_LATITUDE = 0x0002
+GPS_LONGITUDE_REF = 0x0003
+GPS_LONGITUDE = 0x0004
+GPS_ALTITUDE_REF = 0x0005
+GPS_ALTITUDE = 0x0006
+GPS_STATUS = 0x0009
+GPS_IMG_DIRECTION = 0x0011
+
+# Tags whose values are read even if they are outside of the data, other
+# tags like XMP or the strip offsets are skipped then
+NEEDED_TAGS = {
+    IFD0: {DATE_TIME, EXIF_POINTER, GPS_POINTER},
+    EXIF: {DATE_TIME_ORIGINAL, OFFSET_TIME, OFFSET_TIME_ORIGINAL, SUB_SEC_TIME, SUB_SEC_TIME_ORIGINAL},
+    GPS: {GPS_LATITUDE_REF, GPS_LATITUDE, GPS_LONGITUDE_REF, GPS_LONGITUDE, GPS_ALTITUDE_REF, GPS_ALTITUDE, GPS_STATUS, GPS_IMG_DIRECTION},
+}
+
+# Size of the TIFF types in bytes, 13 is the IFD type of TIFF-EP
+TYPE_SIZES = {1: 1, 2: 1, 3: 2, 4: 4, 5: 8, 6: 1, 7: 1, 8: 2, 9: 4, 10: 8, 11: 4, 12: 8, 13: 4}
+
+class UnsupportedLayout(Exception):
+    """
+    Raised when the header of a file can not be parsed by this reader.
+    """
+    pass
+
+def read_tags(path: str) -> dict[str, dict[int, Any]]:
+    """
+    Reads the EXIF tags of a JPEG or TIFF file without loading the image.
+
+    For JPEG only the APP1 segment with the EXIF block is read. TIFF files
+    are mapped into memory, so only the pages with the directories and the
+    values are read, even if they come after the image data. Returns the
+    tags of IFD0, the Exif and the GPS directory by tag id. Raises
+    UnsupportedLayout if the file is neither JPEG nor TIFF or the header is
+    broken, OSError if the file can not be read.
+    """
+
+    with open(path, "rb") as image:
+        start = image.read(4)
+
+        if start[:2] == b"\xff\xd8":
+            image.seek(2)
+            tiff = _exif_segment(image)
+            if tiff is None:
+                return {IFD0: {}, EXIF: {}, GPS: {}}
+            return _parse_tiff(tiff)
+
+        if start in (b"II*\x00", b"MM\x00*"):
+            with mmap.mmap(image.fileno(), 0, access=mmap.ACCESS_READ) as tiff:
+                return _parse_tiff(tiff)
+
+        raise UnsupportedLayout(f"Unknown file format of {path}")
+
+def _exif_segment(image: BinaryIO) -> Optional[bytes]:
+    """
+    Walks the JPEG markers up to the image data and returns the TIFF
+    structure of the EXIF APP1 segment, or None if there is none.
+    """
+
+    while True:
+        marker = image.read(2)
+        if len(marker) < 2 or marker[0] != 0xFF:
+            raise UnsupportedLayout("Broken JPEG marker")
+
+        # Padding before a marker
+        while marker[1] == 0xFF:
+            marker = marker[1:] + image.read(1)
+            if len(marker) < 2:
+                raise UnsupportedLayout("Broken JPEG marker")
+
+        # Start of scan or end of image, the EXIF block comes before
+        if marker[1] in (0xDA, 0xD9):
+            return None
+
+        length = image.read(2)
+        if len(length) < 2:
+            raise UnsupportedLayout("Truncated JPEG segment")
+        length = struct.unpack(">H", length)[0] - 2
+        if length < 0:
+            raise UnsupportedLayout("Broken JPEG segment length")
+
+        if marker[1] == 0xE1:
+            payload = image.read(length)
+            # APP1 is also used for XMP
+            if payload.startswith(b"Exif\x00\x00"):
+                return payload[6:]
+        else:
+            image.seek(length, 1)
+
+def _parse_tiff(tiff: bytes) -> dict[str, dict[int, Any]]:
+    """
+    Parses IFD0 and the Exif and GPS directories of a TIFF structure.
+    """
+
+    if tiff[:2] == b"II":
+        order = "<"
+    elif tiff[:2] == b"MM":
+        order = ">"
+    else:
+        raise UnsupportedLayout("Unknown byte order")
+
+    if len(tiff) < 8:
+        raise UnsupportedLayout("Truncated TIFF header")
+
+    ifd0 = _parse_ifd(tiff, order, struct.unpack(order + "I", tiff[4:8])[0], IFD0)
+
+    exif = {}
+    if EXIF_POINTER in ifd0:
+        exif = _parse_ifd(tiff, order, ifd0[EXIF_POINTER], EXIF)
+
+    gps = {}
+    if GPS_POINTER in ifd0:
+        gps = _parse_ifd(tiff, order, ifd0[GPS_POINTER], GPS)
+
+    return {IFD0: ifd0, EXIF: exif, GPS: gps}
+
+def _parse_ifd(tiff: bytes, order: str, offset: int, name: str) -> dict[int, Any]:
+    """
+    Parses the entries of one image file directory. Values outside of the
+    data are skipped unless the tag is one of the NEEDED_TAGS.
+    """
+
+    if offset + 2 > len(tiff):
+        raise UnsupportedLayout("Directory outside of the header")
+
+    count = struct.unpack(order + "H", tiff[offset:offset + 2])[0]
+    if offset + 2 + count * 12 > len(tiff):
+        raise UnsupportedLayout("Directory outside of the header")
+
+    tags = {}
+    for entry in range(count):
+        position = offset + 2 + entry * 12
+        tag, field_type, value_count = struct.unpack(order + "HHI", tiff[position:position + 8])
+
+        # The sub directories are referenced by a single offset
+        if tag in (EXIF_POINTER, GPS_POINTER) and (field_type not in (4, 13) or value_count != 1):
+            raise UnsupportedLayout("Broken directory pointer")
+
+        # Skip types not defined by TIFF 6.0
+        if field_type not in TYPE_SIZES:
+            continue
+
+        size = TYPE_SIZES[field_type] * value_count
+        if size <= 4:
+            data = tiff[position + 8:position + 8 + size]
+        else:
+            value_offset = struct.unpack(order + "I", tiff[position + 8:position + 12])[0]
+            if value_offset + size > len(tiff):
+                if tag in NEEDED_TAGS[name]:
+                    raise UnsupportedLayout("Value outside of the header")
+                continue
+            data = tiff[value_offset:value_offset + size]
+
+        tags[tag] = _decode_value(data, order, field_type, value_count)
+
+    return tags
+
+def _decode_value(data: bytes, order: str, field_type: int, count: int) -> Any:
+    """
+    Converts the raw bytes of a tag. Single numbers are returned as scalar,
+    several as tuple, text as string and undefined data as bytes. Rationals
+    with a zero denominator, e.g. 0/0 for unknown values, are NaN.
+    """
+
+    if field_type == 2:
+        return data.split(b"\x00", 1)[0].decode("latin-1").strip()
+    if field_type == 7:
+        return data
+    if field_type in (5, 10):
+        values = struct.unpack(order + ("I" if field_type == 5 else "i") * 2 * count, data)
+        return _single(tuple(
+            values[i] / values[i + 1] if values[i + 1] else math.nan for i in range(0, len(values), 2)
+        ))
+
+    formats = {1: "B", 3: "H", 4: "I", 6: "b", 8: "h", 9: "i", 11: "f", 12: "d", 13: "I"}
+    return _single(struct.unpack(order + formats[field_type] * count, data))
+
+def _single(values: tuple) -> Any:
+    return values[0] if len(values) == 1 else values
+
+def timestamp_tags(tags: dict[str, dict[int, Any]]) -> Optional[tuple[str, str, str]]:
+    """
+    Returns date and time, sub seconds and UTC offset of a photo.
+
+    DateTimeOriginal with SubSecTimeOriginal and OffsetTimeOriginal is used
+    if set, otherwise DateTime of IFD0 with SubSecTime and OffsetTime. Sub
+    seconds and offset are empty strings when not set. Returns None if
+    there is no timestamp.
+    """
+
+    exif = tags.get(EXIF, {})
+    if exif.get(DATE_TIME_ORIGINAL):
+        return (
+            exif[DATE_TIME_ORIGINAL],
+            exif.get(SUB_SEC_TIME_ORIGINAL, ""),
+            exif.get(OFFSET_TIME_ORIGINAL, "")
+        )
+
+    if tags.get(IFD0, {}).get(DATE_TIME):
+        return (
+            tags[IFD0][DATE_TIME],
+            exif.get(SUB_SEC_TIME, ""),
+            exif.get(OFFSET_TIME, "")
+        )
+
+    return None
+
+def gps_position(tags: dict[str, dict[int, Any]]) -> Optional[tuple[float, float, Optional[float], Optional[float]]]:
+    """
+    Returns longitude, latitude, altitude and image direction of a photo
+    from the GPS directory. Altitude and direction are None when not set.
+    Returns None if there is no position, also for unknown values like 0/0
+    written by cameras without a fix and for a void GPS status.
+    """
+
+    gps = tags.get(GPS, {})
+    if str(gps.get(GPS_STATUS, "A")).upper().startswith("V"):
+        return None
+
+    latitude = _degrees(gps.get(GPS_LATITUDE))
+    longitude = _degrees(gps.get(GPS_LONGITUDE))
+    if latitude is None or longitude is None or math.isnan(latitude) or math.isnan(longitude):
+        return None
+
+    if str(gps.get(GPS_LATITUDE_REF, "N")).upper().startswith("S"):
+        latitude = -latitude
+    if str(gps.get(GPS_LONGITUDE_REF, "E")).upper().startswith("W"):
+        longitude = -longitude
+
+    altitude = gps.get(GPS_ALTITUDE)
+    if isinstance(altitude, (int, float)) and not math.isnan(altitude):
+        # Reference 1 means below sea level
+        altitude = float(-altitude if gps.get(GPS_ALTITUDE_REF) in (1, b"\x01") else altitude)
+    else:
+        altitude = None
+
+    direction = gps.get(GPS_IMG_DIRECTION)
+    direction = float(direction) if isinstance(direction, (int, float)) and not math.isnan(direction) else None
+
+    return longitude, latitude, altitude, direction
+
+def _degrees(value: Any) -> Optional[float]:
+    """
+    Converts degrees, minutes and seconds to decimal degrees.
+    """
+    if isinstance(value, (int, float)):
+        return float(value)
+    if not isinstance(value, tuple) or not value:
+        return None
+    degrees = 0.0
+    for part, divisor in zip(value, (1, 60, 3600)):
+        degrees += part / divisor
+    return degrees
+
+def to_datetime(value: str, sub_sec: str = "", offset: str = "") -> QDateTime:
+    """
+    Converts EXIF date and time to a QDateTime. Without an UTC offset the
+    time is local time, like QgsExifTools reads it. The result is invalid if
+    the value can not be parsed.
+    """
+
+    date_time = QDateTime.fromString(value[:19], "yyyy:MM:dd hh:mm:ss")
+    if not date_time.isValid():
+        return date_time
+
+    if str(sub_sec).strip().isdigit():
+        date_time = date_time.addMSecs(int((str(sub_sec).strip() + "000")[:3]))
+
+    match = re.fullmatch(r"([+-])(\d{2}):(\d{2})", str(offset).strip())
+    if match:
+        seconds = (int(match.group(2)) * 3600 + int(match.group(3)) * 60) * (-1 if match.group(1) == "-" else 1)
+        date_time = QDateTime(date_time.date(), date_time.time(), Qt.OffsetFromUTC, seconds)
+
+    return date_time
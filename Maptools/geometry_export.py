@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+
+import io
+from typing import Optional
+from qgis.core import (
+    QgsCoordinateReferenceSystem,
+    QgsCoordinateTransform,
+    QgsFeatureRequest,
+    QgsJsonUtils,
+    QgsProject,
+    QgsTask,
+    QgsVectorLayer,
+    QgsVectorLayerFeatureSource
+)
+
+# Export formats
+WKT = 0
+WKB_HEX = 1
+GEOJSON = 2
+GEOMETRY_COLLECTION = 3
+
+FORMAT_NAMES = ["WKT", "WKB (hex)", "GeoJSON FeatureCollection", "WKT GEOMETRYCOLLECTION"]
+
+# Separators between the geometries of a format
+SEPARATORS = {WKT: " ", WKB_HEX: "\n", GEOJSON: ", ", GEOMETRY_COLLECTION: ", "}
+
+class GeometryExportTask(QgsTask):
+    """
+    Exports the geometries of the selected features of a layer in the
+    background, either to a string for the clipboard or to a file.
+
+    The selection is taken when the task is created, the features are read
+    from a snapshot of the layer, so the layer itself is not touched by the
+    task.
+    """
+
+    def __init__(self, layer: QgsVectorLayer, export_format: int = WKT, file_path: Optional[str] = None):
+        super().__init__(f"Export {FORMAT_NAMES[export_format]} of {layer.name()}", QgsTask.CanCancel)
+
+        self.layer_name = layer.name()
+        self.source = QgsVectorLayerFeatureSource(layer)
+        self.feature_ids = layer.selectedFeatureIds()
+        self.export_format = export_format
+        self.file_path = file_path
+
+        # GeoJSON is always WGS84
+        self.transform = None
+        if export_format == GEOJSON:
+            self.transform = QgsCoordinateTransform(
+                layer.crs(),
+                QgsCoordinateReferenceSystem("EPSG:4326"),
+                QgsProject.instance()
+            )
+
+        self.text = None
+        self.exported = 0
+        self.error = None
+
+    def run(self) -> bool:
+        request = QgsFeatureRequest().setFilterFids(self.feature_ids)
+        if self.export_format != GEOJSON:
+            request.setNoAttributes()
+
+        if self.file_path:
+            output = open(self.file_path, "w", encoding="utf-8")
+        else:
+            output = io.StringIO()
+
+        total = 100.0 / len(self.feature_ids) if self.feature_ids else 0
+
+        try:
+            if self.export_format == GEOJSON:
+                output.write('{"type": "FeatureCollection", "features": [')
+            elif self.export_format == GEOMETRY_COLLECTION:
+                output.write("GEOMETRYCOLLECTION ")
+
+            for current, feature in enumerate(self.source.getFeatures(request)):
+                if self.isCanceled():
+                    return False
+
+                geometry = feature.geometry()
+                if geometry.isNull():
+                    continue
+
+                # Separator in front of all but the first geometry
+                if self.exported > 0:
+                    output.write(SEPARATORS[self.export_format])
+                elif self.export_format == GEOMETRY_COLLECTION:
+                    output.write("(")
+
+                if self.export_format == WKB_HEX:
+                    output.write(bytes(geometry.asWkb().toHex()).decode("ascii"))
+                elif self.export_format == GEOJSON:
+                    geometry.transform(self.transform)
+                    output.write(
+                        f'{{"type": "Feature", "id": {feature.id()}, '
+                        f'"geometry": {geometry.asJson()}, '
+                        f'"properties": {QgsJsonUtils.exportAttributes(feature)}}}'
+                    )
+                else:
+                    output.write(geometry.asWkt())
+
+                self.exported += 1
+                self.setProgress(current * total)
+
+            if self.export_format == GEOJSON:
+                output.write("]}")
+            elif self.export_format == GEOMETRY_COLLECTION:
+                # EMPTY if all selected geometries are null
+                output.write(")" if self.exported else "EMPTY")
+
+            if not self.file_path:
+                self.text = output.getvalue()
+
+        except Exception as error:
+            self.error = str(error)
+            return False
+
+        finally:
+            output.close()
+
+        return True
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+
+from qgis.core import QgsDataProvider, QgsMapLayer, QgsProject
+from qgis.PyQt.QtCore import QObject, QTimer, pyqtSignal
+
+# What to do with the layers
+RELOAD = 0
+REOPEN = 1
+
+class LayerBatch(QObject):
+    """
+    Reloads or reopens many layers, one layer per pass of the event loop.
+
+    The provider work of each layer runs on the main thread, as QGIS layers
+    can not take over a provider opened elsewhere. Between the layers the
+    GUI stays responsive and shows the progress. The layers are repainted
+    with the next refresh of the canvas, so the canvas is drawn once for
+    the whole batch instead of once per layer.
+    """
+
+    progressChanged = pyqtSignal(int)
+    finished = pyqtSignal()
+
+    def __init__(self, layers: list[QgsMapLayer], mode: int = RELOAD, parent: QObject = None):
+        super().__init__(parent)
+
+        self.layer_ids = [layer.id() for layer in layers]
+        self.mode = mode
+        self.current = 0
+        self.done = []
+        self.failed = []
+        self.canceled = False
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.step)
+
+    def start(self):
+        self.timer.start(0)
+
+    def cancel(self):
+        if self.timer.isActive():
+            self.timer.stop()
+            self.canceled = True
+            self.finished.emit()
+
+    def step(self):
+        layer = QgsProject.instance().mapLayer(self.layer_ids[self.current])
+        self.current += 1
+
+        # Layers removed in the meantime are skipped
+        if layer is not None:
+            if apply_layer(layer, self.mode):
+                self.done.append(layer.id())
+            else:
+                self.failed.append(layer.name())
+
+        self.progressChanged.emit(self.current)
+
+        if self.current >= len(self.layer_ids):
+            self.timer.stop()
+            self.finished.emit()
+
+def apply_layer(layer: QgsMapLayer, mode: int) -> bool:
+    """
+    Reloads or reopens a layer, which is repainted with the next refresh of
+    the canvas. Returns if the layer is valid afterwards.
+    """
+
+    if mode == REOPEN:
+        options = QgsDataProvider.ProviderOptions()
+        options.transformContext = QgsProject.instance().transformContext()
+        layer.setDataSource(layer.source(), layer.name(), layer.providerType(), options)
+
+        if layer.isValid() and layer.type() == QgsMapLayer.VectorLayer:
+            layer.setCrs(layer.dataProvider().sourceCrs())
+            layer.setExtent(layer.dataProvider().sourceExtent())
+    else:
+        layer.reload()
+
+    layer.triggerRepaint(True)
+    return layer.isValid()
@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+
+import os
+from qgis.core import QgsMapLayer, QgsProject, QgsProviderRegistry
+from qgis.PyQt.QtCore import QFileSystemWatcher, QObject, QTimer, pyqtSignal
+
+# Time to wait for further writes before the files are compared
+DEBOUNCE_MSECS = 1500
+
+def source_files(layer: QgsMapLayer) -> list[str]:
+    """
+    Returns the files of a file-backed layer, including the files next to
+    it which are changed by writes as well. Layers without a file as source
+    return an empty list.
+    """
+
+    parts = QgsProviderRegistry.instance().decodeUri(layer.providerType(), layer.source())
+    path = parts.get("path")
+    if not path or not os.path.isfile(path):
+        return []
+
+    files = [path]
+    stem, extension = os.path.splitext(path)
+    if extension.lower() == ".shp":
+        files += [stem + ".dbf", stem + ".shx"]
+    elif extension.lower() in (".gpkg", ".sqlite", ".db"):
+        files.append(path + "-wal")
+
+    return files
+
+def snapshot(files: list[str]) -> tuple:
+    """
+    Returns modification time and size of the files, None for missing files.
+    """
+
+    state = []
+    for path in files:
+        try:
+            stat = os.stat(path)
+            state.append((stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            state.append(None)
+    return tuple(state)
+
+class LayerWatcher(QObject):
+    """
+    Watches the files of the file-backed layers of the project.
+
+    Notifications of the file system are collected until no write happened
+    for DEBOUNCE_MSECS, then modification time and size of the files are
+    compared and the ids of the layers with changed files are emitted.
+    The folders are watched as well, so files replaced by a rename are
+    noticed and watched again. Layers reloaded by the plugin itself are
+    suspended meanwhile and get a new snapshot afterwards. Changes of
+    layers in edit mode are kept until editing stops, and edits saved by
+    QGIS itself are not taken for a change.
+    """
+
+    layersChanged = pyqtSignal(list)
+
+    def __init__(self, parent: QObject = None):
+        super().__init__(parent)
+
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.fileChanged.connect(self.schedule)
+        self.watcher.directoryChanged.connect(self.schedule)
+
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(DEBOUNCE_MSECS)
+        self.timer.timeout.connect(self.compare)
+
+        # Layer id to files and their snapshot
+        self.layers = {}
+        self.suspended = set()
+
+    def start(self):
+        project = QgsProject.instance()
+        for layer in project.mapLayers().values():
+            self.addLayer(layer)
+        project.layersAdded.connect(self.addLayers)
+        project.layersWillBeRemoved.connect(self.removeLayers)
+
+    def stop(self):
+        project = QgsProject.instance()
+        project.layersAdded.disconnect(self.addLayers)
+        project.layersWillBeRemoved.disconnect(self.removeLayers)
+
+        self.timer.stop()
+        for layer_id in self.layers:
+            self.disconnectLayer(layer_id)
+        self.layers.clear()
+        self.suspended.clear()
+        self.updatePaths()
+
+    def addLayers(self, layers: list[QgsMapLayer]):
+        for layer in layers:
+            self.addLayer(layer)
+
+    def addLayer(self, layer: QgsMapLayer):
+        files = source_files(layer)
+        if files:
+            self.layers[layer.id()] = (files, snapshot(files))
+            if layer.type() == QgsMapLayer.VectorLayer:
+                layer.editingStopped.connect(self.schedule)
+                layer.afterCommitChanges.connect(self.committed)
+            self.updatePaths()
+
+    def removeLayers(self, layer_ids: list[str]):
+        for layer_id in layer_ids:
+            if self.layers.pop(layer_id, None) is not None:
+                self.disconnectLayer(layer_id)
+            self.suspended.discard(layer_id)
+        self.updatePaths()
+
+    def disconnectLayer(self, layer_id: str):
+        layer = QgsProject.instance().mapLayer(layer_id)
+        if layer is not None and layer.type() == QgsMapLayer.VectorLayer:
+            layer.editingStopped.disconnect(self.schedule)
+            layer.afterCommitChanges.disconnect(self.committed)
+
+    def suspend(self, layer_ids: list[str]):
+        """
+        Ignores changes of the layers until resume() is called.
+        """
+        self.suspended.update(layer_ids)
+
+    def resume(self, layer_ids: list[str]):
+        """
+        Watches the layers again, starting from the current state of their
+        files.
+        """
+        for layer_id in layer_ids:
+            self.suspended.discard(layer_id)
+            if layer_id in self.layers:
+                files = self.layers[layer_id][0]
+                self.layers[layer_id] = (files, snapshot(files))
+        self.updatePaths()
+
+    def updatePaths(self):
+        """
+        Watches the existing files of all layers and their folders, files
+        removed by a rename of the writer are added again.
+        """
+
+        paths = set()
+        for files, _ in self.layers.values():
+            for path in files:
+                paths.add(os.path.dirname(path))
+                if os.path.exists(path):
+                    paths.add(path)
+
+        watched = set(self.watcher.files() + self.watcher.directories())
+        if watched - paths:
+            self.watcher.removePaths(list(watched - paths))
+        if paths - watched:
+            self.watcher.addPaths(sorted(paths - watched))
+
+    def schedule(self, path: str = ""):
+        """
+        Restarts the timer, so a burst of writes is compared once. Also
+        called when editing stops, to reopen layers changed meanwhile.
+        """
+        self.timer.start()
+
+    def committed(self):
+        """
+        Takes a new snapshot of the files written by QGIS when the edits of
+        a layer are saved, for all layers sharing these files.
+        """
+        layer = self.sender()
+        if layer is None or layer.id() not in self.layers:
+            return
+
+        written = set(self.layers[layer.id()][0])
+        for layer_id, (files, _) in self.layers.items():
+            if written.intersection(files):
+                self.layers[layer_id] = (files, snapshot(files))
+
+    def compare(self):
+        project = QgsProject.instance()
+        changed = []
+        for layer_id, (files, state) in self.layers.items():
+            if layer_id in self.suspended:
+                continue
+            # Reopening would drop the edits, the old snapshot is kept until
+            # editing stops
+            layer = project.mapLayer(layer_id)
+            if layer is not None and layer.isEditable():
+                continue
+            current = snapshot(files)
+            if current != state:
+                self.layers[layer_id] = (files, current)
+                changed.append(layer_id)
+
+        self.updatePaths()
+
+        if changed:
+            self.layersChanged.emit(changed)
@@ -14,16 +14,34 @@
 # *                                                                         *
 # ***************************************************************************
 
+import json
 import os.path
+import time
+from urllib.parse import quote
 from PyQt5.QtWidgets import QApplication
-from qgis.core import Qgis, QgsMapLayer, QgsRasterLayer, QgsProject, QgsCoordinateReferenceSystem, QgsApplication
+from qgis.core import Qgis, QgsMessageLog, QgsMapLayer, QgsRasterLayer, QgsProject, QgsCoordinateReferenceSystem, QgsApplication, QgsSettings, QgsCoordinateTransform, QgsCsException
 from qgis.gui import QgsMessageBar, QgsExtentWidget, QgsProjectionSelectionWidget
 from qgis.utils import iface
 from qgis.PyQt.QtGui import QIcon
-from qgis.PyQt.QtWidgets import QToolButton, QLabel, QFileDialog
-from qgis.PyQt.QtCore import QStandardPaths
+from qgis.PyQt.QtWidgets import QToolButton, QLabel, QFileDialog, QMenu, QInputDialog, QLineEdit, QProgressBar
+from qgis.PyQt.QtCore import QStandardPaths, QTimer, QUrl
 
-from .maptools_provider import MaptoolsAlgorithms
+# The helper modules are imported by the handlers using them, so starting
+# QGIS does not import them
+
+# Formats of the copied extent
+EXTENT_BBOX = 0
+EXTENT_WKT = 1
+EXTENT_GEOJSON = 2
+EXTENT_PROJECT = 3
+
+EXTENT_FORMAT_NAMES = ["Bounding box (xmin, ymin, xmax, ymax)", "WKT polygon", "GeoJSON bbox", "Bounding box in project CRS"]
+
+# Time without navigation before the extent widget is updated
+EXTENT_DEBOUNCE_MSECS = 200
+
+# Time initGui may take before a warning is logged
+STARTUP_BUDGET_MSECS = 50
 
 
 class MapToolsPlugin:
@@ -36,16 +54,31 @@ class MapToolsPlugin:
         # initialize plugin directory
         self.plugin_dir = os.path.dirname(__file__)
         self.plugin_name = 'Maptools'
+        self.exportTask = None
+        self.layerBatch = None
+        self.layerMessage = None
+        self.layerWatcher = None
+        self.pendingLayerIds = set()
+        self.extentTransform = None
+        self.extentDirty = False
+        self.styleCache = None
+        self.prefetchTask = None
+        self.extentWidget = None
 
     def initProcessing(self):
         """Init Processing provider for QGIS >= 3.8."""
         
+        # The provider imports the algorithms only when QGIS loads them
+        from .maptools_provider import MaptoolsAlgorithms
+        
         self.provider = MaptoolsAlgorithms()
         QgsApplication.processingRegistry().addProvider(self.provider)        
 
 
     def initGui(self):
 
+        started = time.perf_counter()
+
         self.toolbar = self.iface.addToolBar("map-tools")
         self.toolbar.setObjectName("map-tools")
         self.toolbar.setVisible(True)
@@ -65,12 +98,23 @@ class MapToolsPlugin:
         self.reopenButton.clicked.connect(self.reopen)
         self.toolbar.addWidget(self.reopenButton)
 
+        self.watchButton = QToolButton()
+        self.watchButton.setText("Watch files")
+        self.watchButton.setToolTip("Reload layers automatically when their files are changed on disk")
+        self.watchButton.setCheckable(True)
+        self.watchButton.toggled.connect(self.watchLayers)
+        self.toolbar.addWidget(self.watchButton)
+
         self.toolbar.addSeparator()
         
         self.wktButton = QToolButton()
         self.wktButton.setText("Feature WKT")
-        self.wktButton.setToolTip("Copy WKT of the selected features of the activ layer")
-        self.wktButton.clicked.connect(self.getWkt)
+        self.wktButton.setToolTip("Copy WKT of the selected features of the activ layer, other formats in the menu")
+        self.wktButton.clicked.connect(lambda: self.getWkt())
+        self.wktMenu = QMenu()
+        self.wktMenu.aboutToShow.connect(self.fillWktMenu)
+        self.wktButton.setMenu(self.wktMenu)
+        self.wktButton.setPopupMode(QToolButton.MenuButtonPopup)
         self.toolbar.addWidget(self.wktButton)
         
         self.toolbar.addSeparator()
@@ -79,6 +123,15 @@ class MapToolsPlugin:
         self.osmButton.setText("OSM Basemap")
         self.osmButton.setToolTip("Add OSM Carto base map")
         self.osmButton.clicked.connect(self.addOSM)
+        self.osmMenu = QMenu()
+        self.cacheOnlyAction = self.osmMenu.addAction("Use tile cache only (offline)")
+        self.cacheOnlyAction.setCheckable(True)
+        self.cacheOnlyAction.setChecked(QgsSettings().value("maptools/tile_cache_only", False, type=bool))
+        self.cacheOnlyAction.toggled.connect(self.setCacheOnly)
+        self.osmMenu.addAction("Prefetch tiles of the map extent").triggered.connect(self.prefetchTiles)
+        self.osmMenu.addAction("Set tile URL...").triggered.connect(self.setTileUrl)
+        self.osmButton.setMenu(self.osmMenu)
+        self.osmButton.setPopupMode(QToolButton.MenuButtonPopup)
         self.toolbar.addWidget(self.osmButton)
         
         self.toolbar.addSeparator()
@@ -87,12 +140,21 @@ class MapToolsPlugin:
         self.loadQmlButton.setText("Load QML-Style")
         self.loadQmlButton.setToolTip("Load QML style from file and apply it to the active layer")
         self.loadQmlButton.clicked.connect(self.loadQML)
+        self.loadQmlMenu = QMenu()
+        self.loadQmlMenu.addAction("Apply QML style to selected layers").triggered.connect(self.loadQMLSelected)
+        self.loadQmlMenu.addAction("Apply QML styles of a folder by layer name").triggered.connect(self.loadQMLFolder)
+        self.loadQmlButton.setMenu(self.loadQmlMenu)
+        self.loadQmlButton.setPopupMode(QToolButton.MenuButtonPopup)
         self.toolbar.addWidget(self.loadQmlButton)   
         
         self.saveQmlButton = QToolButton()
         self.saveQmlButton.setText("Save QML-Style")
         self.saveQmlButton.setToolTip("Save layer style of the active layer to QML file")
         self.saveQmlButton.clicked.connect(self.saveQML)
+        self.saveQmlMenu = QMenu()
+        self.saveQmlMenu.addAction("Save QML styles of selected layers to a folder").triggered.connect(self.saveQMLSelected)
+        self.saveQmlButton.setMenu(self.saveQmlMenu)
+        self.saveQmlButton.setPopupMode(QToolButton.MenuButtonPopup)
         self.toolbar.addWidget(self.saveQmlButton)  
         
         self.toolbar.addSeparator()
@@ -100,41 +162,144 @@ class MapToolsPlugin:
         self.extentName = QLabel("Extent: ")
         self.toolbar.addWidget(self.extentName)
         
-        self.extentWidget = QgsExtentWidget()
-        self.extentWidget.setMapCanvas(self.iface.mapCanvas())
-        self.extentWidget.setOriginalExtent(self.iface.mapCanvas().extent(), QgsProject.instance().crs())
-        self.extentWidget.setCurrentExtent(self.iface.mapCanvas().extent(), QgsProject.instance().crs())
+        # The extent widget is built once QGIS has started, see initExtentWidget
         self.outputCrs = QgsCoordinateReferenceSystem.fromOgcWmsCrs("EPSG:4326")
-        self.extentWidget.setOutputCrs(self.outputCrs)
-        self.toolbar.addWidget(self.extentWidget)
-        self.iface.mapCanvas().extentsChanged.connect(self.updateExtentWidget)
+        self.startupTimer = QTimer()
+        self.startupTimer.setSingleShot(True)
+        self.startupTimer.timeout.connect(self.initExtentWidget)
+        
+        # Navigation steps are coalesced, the widget is updated once the canvas rests
+        self.extentTimer = QTimer()
+        self.extentTimer.setSingleShot(True)
+        self.extentTimer.setInterval(EXTENT_DEBOUNCE_MSECS)
+        self.extentTimer.timeout.connect(self.updateExtentWidget)
+        self.toolbar.visibilityChanged.connect(self.showExtentWidget)
+        QgsProject.instance().crsChanged.connect(self.resetExtentTransform)
 
         self.copyButton = QToolButton()
         self.copyButton.setText("Copy extent")
-        self.copyButton.setToolTip("Copy extent xmin, ymin, xmax, ymax")
-        self.copyButton.clicked.connect(self.copyExtent)
-        self.toolbar.addWidget(self.copyButton)
+        self.copyButton.setToolTip("Copy extent xmin, ymin, xmax, ymax, other formats in the menu")
+        self.copyButton.clicked.connect(lambda: self.copyExtent())
+        self.copyMenu = QMenu()
+        for extent_format, format_name in enumerate(EXTENT_FORMAT_NAMES):
+            action = self.copyMenu.addAction(f"Copy {format_name}")
+            action.triggered.connect(lambda checked, extent_format=extent_format: self.copyExtent(extent_format))
+        self.copyButton.setMenu(self.copyMenu)
+        self.copyButton.setPopupMode(QToolButton.MenuButtonPopup)
+        self.copyButtonAction = self.toolbar.addWidget(self.copyButton)
 
         self.initProcessing()
+        
+        self.startupTimer.start()
+        
+        elapsed = (time.perf_counter() - started) * 1000
+        level = Qgis.Warning if elapsed > STARTUP_BUDGET_MSECS else Qgis.Info
+        QgsMessageLog.logMessage(f"initGui took {elapsed:.1f} ms, budget {STARTUP_BUDGET_MSECS} ms", self.plugin_name, level=level)
+
+    def initExtentWidget(self):
+        """Build the extent widget in front of the copy button and follow the map canvas."""
+        
+        if self.extentWidget is not None:
+            return
+        
+        started = time.perf_counter()
+        
+        self.extentWidget = QgsExtentWidget()
+        self.extentWidget.setMapCanvas(self.iface.mapCanvas())
+        self.extentWidget.setOriginalExtent(self.iface.mapCanvas().extent(), QgsProject.instance().crs())
+        self.extentWidget.setOutputCrs(self.outputCrs)
+        self.toolbar.insertWidget(self.copyButtonAction, self.extentWidget)
+        self.iface.mapCanvas().extentsChanged.connect(self.extentTimer.start)
+        self.updateExtentWidget(force=True)
+        
+        elapsed = (time.perf_counter() - started) * 1000
+        QgsMessageLog.logMessage(f"Extent widget took {elapsed:.1f} ms", self.plugin_name, level=Qgis.Info)
 
-    def updateExtentWidget(self):
-        """Update QgsExtentWidget when map extent changes."""
-        self.extentWidget.setCurrentExtent(self.iface.mapCanvas().extent(), QgsProject.instance().crs())
-        self.extentWidget.update()
+    def updateExtentWidget(self, force=False):
+        """Update QgsExtentWidget when map extent changes.
+        
+        A hidden widget is only marked as outdated and updated once it is
+        shown again or the extent is copied.
+        """
+        self.extentTimer.stop()
+        
+        # Not built yet, it starts with the current extent
+        if self.extentWidget is None:
+            return
+        
+        if not force and not self.extentWidget.isVisible():
+            self.extentDirty = True
+            return
+        
+        self.extentDirty = False
+        extent = self.outputExtent()
+        if extent is not None:
+            # Already in the output crs, so the widget does not transform again
+            self.extentWidget.setCurrentExtent(extent, self.outputCrs)
         # self.iface.messageBar().pushMessage(self.plugin_name, "Extent widget updated", level=Qgis.Info, duration=3)
+
+    def showExtentWidget(self, visible):
+        """Update an outdated extent widget when the toolbar is shown."""
+        if visible and self.extentDirty:
+            self.updateExtentWidget()
+
+    def resetExtentTransform(self):
+        """Create the transform of the extent again after the project crs changed."""
+        self.extentTransform = None
+        self.extentTimer.start()
+
+    def outputExtent(self):
+        """Map extent in the output crs, None if it can not be transformed.
         
+        The transform is created once per project crs.
+        """
+        if self.extentTransform is None:
+            project = QgsProject.instance()
+            self.extentTransform = QgsCoordinateTransform(project.crs(), self.outputCrs, project)
+        
+        try:
+            return self.extentTransform.transformBoundingBox(self.iface.mapCanvas().extent())
+        except QgsCsException:
+            return None
         
     def unload(self):
         """Removes the plugin menu item and icon from QGIS GUI."""
 
-        self.iface.mapCanvas().extentsChanged.disconnect(self.updateExtentWidget)
+        self.startupTimer.stop()
+        self.startupTimer.timeout.disconnect(self.initExtentWidget)
+        self.extentTimer.stop()
+        self.extentTimer.timeout.disconnect(self.updateExtentWidget)
+        if self.extentWidget is not None:
+            self.iface.mapCanvas().extentsChanged.disconnect(self.extentTimer.start)
+        self.toolbar.visibilityChanged.disconnect(self.showExtentWidget)
+        QgsProject.instance().crsChanged.disconnect(self.resetExtentTransform)
         self.reloadButton.clicked.disconnect(self.reload)
         self.reopenButton.clicked.disconnect(self.reopen)
-        self.wktButton.clicked.disconnect(self.getWkt)
+        self.watchButton.toggled.disconnect(self.watchLayers)
+        self.watchLayers(False)
+        self.wktButton.clicked.disconnect()
+        self.wktMenu.aboutToShow.disconnect(self.fillWktMenu)
+        self.wktMenu.clear()
+        if self.exportTask is not None:
+            self.exportTask.taskCompleted.disconnect(self.exportFinished)
+            self.exportTask.taskTerminated.disconnect(self.exportFinished)
+            self.exportTask.cancel()
+        if self.layerBatch is not None:
+            self.layerBatch.finished.disconnect(self.layersDone)
+            self.layerBatch.cancel()
         self.osmButton.clicked.disconnect(self.addOSM)
+        self.cacheOnlyAction.toggled.disconnect(self.setCacheOnly)
+        self.osmMenu.clear()
+        if self.prefetchTask is not None:
+            self.prefetchTask.taskCompleted.disconnect(self.prefetchFinished)
+            self.prefetchTask.taskTerminated.disconnect(self.prefetchFinished)
+            self.prefetchTask.cancel()
         self.loadQmlButton.clicked.disconnect(self.loadQML)
+        self.loadQmlMenu.clear()
         self.saveQmlButton.clicked.disconnect(self.saveQML)
-        self.copyButton.clicked.disconnect(self.copyExtent)
+        self.saveQmlMenu.clear()
+        self.copyButton.clicked.disconnect()
+        self.copyMenu.clear()
 
         self.iface.mainWindow().removeToolBar(self.toolbar)
 
@@ -142,61 +307,199 @@ class MapToolsPlugin:
 
     def reload(self):
         """Reload selected layer(s)."""
-        layers = self.iface.layerTreeView().selectedLayers()
-
-        if len(layers) == 0:
-            self.iface.messageBar().pushMessage(self.plugin_name, "No selected layer(s).", level=Qgis.Warning, duration=6 )
-        else:
-            for layer in layers:
-                layer.reload()
-                layer.triggerRepaint()
-                self.iface.messageBar().pushMessage(self.plugin_name, f"Reload Layer {layer.name()}", level=Qgis.Success, duration=3)
+        from .layer_tasks import RELOAD
+        self.runLayerBatch(RELOAD)
 
     def reopen(self):
         """Reopen selected layer(s), which also updates the extent and crs in contrast to `reload`."""
-        layers = self.iface.layerTreeView().selectedLayers()
+        from .layer_tasks import REOPEN
+        self.runLayerBatch(REOPEN)
+
+    def watchLayers(self, enabled):
+        """Start or stop watching the files of file-backed layers."""
+        if enabled and self.layerWatcher is None:
+            from .layer_watcher import LayerWatcher
+            self.layerWatcher = LayerWatcher()
+            self.layerWatcher.layersChanged.connect(self.layersChanged)
+            self.layerWatcher.start()
+            
+        elif not enabled and self.layerWatcher is not None:
+            self.layerWatcher.layersChanged.disconnect(self.layersChanged)
+            self.layerWatcher.stop()
+            self.layerWatcher = None
+            self.pendingLayerIds.clear()
+
+    def layersChanged(self, layer_ids):
+        """Reopen the layers whose files changed, later if layers are still reopened."""
+        self.pendingLayerIds.update(layer_ids)
+        
+        if self.layerBatch is None:
+            from .layer_tasks import REOPEN
+            project = QgsProject.instance()
+            layers = [project.mapLayer(layer_id) for layer_id in self.pendingLayerIds]
+            layers = [layer for layer in layers if layer is not None]
+            self.pendingLayerIds.clear()
+            # All changed layers may have been removed in the meantime
+            if layers:
+                self.runLayerBatch(REOPEN, layers)
+
+    def runLayerBatch(self, mode, layers=None):
+        """Reload or reopen the selected layer(s) one after another.
+        
+        The GUI stays responsive between the layers and shows the progress,
+        the map canvas is refreshed once in `layersDone`.
+        """
+        from .layer_tasks import REOPEN, LayerBatch
+        
+        if layers is None:
+            layers = self.iface.layerTreeView().selectedLayers()
 
         if len(layers) == 0:
             self.iface.messageBar().pushMessage(self.plugin_name, "No selected layer(s).", level=Qgis.Warning, duration=6 )
+            return
+        
+        if self.layerBatch is not None:
+            self.iface.messageBar().pushMessage(self.plugin_name, "Layers are still reloaded, try again later", level=Qgis.Warning, duration=6 )
+            return
+        
+        # Memory layers have no source to open again, reopening would empty them
+        memory_layers = [layer for layer in layers if layer.providerType() == "memory"]
+        if memory_layers and mode == REOPEN:
+            self.iface.messageBar().pushMessage(self.plugin_name, f"Skipped {len(memory_layers)} memory layer(s)", level=Qgis.Warning, duration=6 )
+            layers = [layer for layer in layers if layer.providerType() != "memory"]
+            if len(layers) == 0:
+                return
+        
+        action = "Reopen" if mode == REOPEN else "Reload"
+        message = self.iface.messageBar().createMessage(self.plugin_name, f"{action} {len(layers)} layer(s)")
+        progress = QProgressBar()
+        progress.setMaximum(len(layers))
+        message.layout().addWidget(progress)
+        self.layerMessage = self.iface.messageBar().pushWidget(message, Qgis.Info)
+        
+        # Reopening changes the files of some formats, e.g. the -wal file of a
+        # GeoPackage, which must not be taken for a change by the watcher
+        if self.layerWatcher is not None:
+            self.layerWatcher.suspend([layer.id() for layer in layers])
+        
+        self.layerBatch = LayerBatch(layers, mode)
+        self.layerBatch.progressChanged.connect(progress.setValue)
+        self.layerBatch.finished.connect(self.layersDone)
+        self.layerBatch.start()
+
+    def layersDone(self):
+        """Refresh the canvas once after a layer batch and report the result."""
+        from .layer_tasks import REOPEN
+        
+        batch = self.layerBatch
+        self.layerBatch = None
+        action = "Reopen" if batch.mode == REOPEN else "Reload"
+        
+        if self.layerWatcher is not None:
+            self.layerWatcher.resume(batch.layer_ids)
+        
+        self.iface.messageBar().popWidget(self.layerMessage)
+        self.layerMessage = None
+        self.iface.mapCanvas().refresh()
+        
+        if batch.canceled:
+            self.iface.messageBar().pushMessage(self.plugin_name, f"{action} cancelled after {len(batch.done)} layer(s)", level=Qgis.Warning, duration=6 )
+        elif batch.failed:
+            self.iface.messageBar().pushMessage(self.plugin_name, f"{action} {len(batch.done)} layer(s), invalid: {', '.join(batch.failed)}", level=Qgis.Warning, duration=6 )
         else:
-            for layer in layers:
-                
-                if layer.type() == QgsMapLayer.VectorLayer:
+            self.iface.messageBar().pushMessage(self.plugin_name, f"{action} {len(batch.done)} layer(s)", level=Qgis.Success, duration=3)
+        
+        # Changes noticed by the watcher while the layers were reopened
+        if self.pendingLayerIds:
+            self.layersChanged([])
                 
-                    layer.setDataSource(layer.source(), layer.name(), layer.providerType())
-                    layer.setCrs(layer.dataProvider().sourceCrs())
-                    layer.setExtent(layer.dataProvider().sourceExtent())
-                    layer.triggerRepaint()
+    def fillWktMenu(self):
+        """Add the export formats to the menu of the WKT button when it is shown first."""
+        if self.wktMenu.actions():
+            return
+        
+        from .geometry_export import FORMAT_NAMES
+        for export_format, format_name in enumerate(FORMAT_NAMES):
+            action = self.wktMenu.addAction(f"Copy {format_name}")
+            action.triggered.connect(lambda checked, export_format=export_format: self.getWkt(export_format))
 
-                    self.iface.messageBar().pushMessage(self.plugin_name, f"Reopen Layer {layer.name()}", level=Qgis.Success, duration=3)
-                
-                else:
-                    self.iface.messageBar().pushMessage(self.plugin_name, "Only implmented for vector layers", level=Qgis.Warning, duration=6 )
-                    
-                
-    def getWkt(self):
-        """Get WKT of selected features in the active layer
+    def getWkt(self, export_format=None):
+        """Get WKT or another format of selected features in the active layer.
+        
+        The export runs as background task. Large selections are written to a
+        file instead of the clipboard, the threshold is the setting
+        maptools/export_threshold (number of features).
         """
+        from .geometry_export import FORMAT_NAMES, GEOJSON, WKT, GeometryExportTask
+        
+        if export_format is None:
+            export_format = WKT
         
         layer = self.iface.activeLayer()
         
-        if layer.type() == QgsMapLayer.VectorLayer:
+        if layer is not None and layer.type() == QgsMapLayer.VectorLayer:
             
-            output = ""
-            for feature in layer.selectedFeatures():
-                output = output + " " + feature.geometry().asWkt()
-                
-            clipboard = QApplication.clipboard()
-            clipboard.setText(output)
-                
-            self.iface.messageBar().pushMessage(self.plugin_name, "Copied feature WKT to clipboard", level=Qgis.Success, duration=3)
+            if layer.selectedFeatureCount() == 0:
+                self.iface.messageBar().pushMessage(self.plugin_name, "No selected features.", level=Qgis.Warning, duration=6 )
+                return
+            
+            if self.exportTask is not None:
+                self.iface.messageBar().pushMessage(self.plugin_name, "Export is already running", level=Qgis.Warning, duration=6 )
+                return
+            
+            file_path = None
+            threshold = QgsSettings().value("maptools/export_threshold", 10000, type=int)
+            if layer.selectedFeatureCount() > threshold:
+                suffix = "geojson" if export_format == GEOJSON else "txt"
+                home_dir = str(QStandardPaths.writableLocation(QStandardPaths.HomeLocation))
+                file_path, extension = QFileDialog.getSaveFileName(None, f"Save {FORMAT_NAMES[export_format]} of {layer.selectedFeatureCount()} features", home_dir, f"*.{suffix}")
+                if not file_path:
+                    return
+            
+            self.exportTask = GeometryExportTask(layer, export_format, file_path)
+            self.exportTask.taskCompleted.connect(self.exportFinished)
+            self.exportTask.taskTerminated.connect(self.exportFinished)
+            QgsApplication.taskManager().addTask(self.exportTask)
                 
         else:
             self.iface.messageBar().pushMessage(self.plugin_name, "Works only for vector layers", level=Qgis.Warning, duration=6 )
 
+    def exportFinished(self):
+        """Copy the result of the export task to the clipboard."""
+        from .geometry_export import FORMAT_NAMES
+        
+        task = self.exportTask
+        self.exportTask = None
+        format_name = FORMAT_NAMES[task.export_format]
+        
+        if task.status() != task.Complete:
+            message = f"Export failed: {task.error}" if task.error else "Export cancelled"
+            self.iface.messageBar().pushMessage(self.plugin_name, message, level=Qgis.Warning, duration=6 )
+        
+        elif task.file_path:
+            self.iface.messageBar().pushMessage(self.plugin_name, f"Saved feature {format_name} of {task.exported} features to {task.file_path}", level=Qgis.Success, duration=6)
+            
+        else:
+            clipboard = QApplication.clipboard()
+            clipboard.setText(task.text)
+            
+            self.iface.messageBar().pushMessage(self.plugin_name, f"Copied feature {format_name} to clipboard", level=Qgis.Success, duration=3)
+
     def addOSM(self):
-        layer_url = 'type=xyz&url=https://tile.openstreetmap.org/%7Bz%7D/%7Bx%7D/%7By%7D.png&zmax=19&zmin=0&crs=EPSG3857'
-        layer = QgsRasterLayer(layer_url, 'OpenStreetMap', 'wms')  
+        """Add the basemap, either as tiles from the tile URL or from the tile cache only."""
+        from .tile_cache import MAX_ZOOM, TileCache
+        
+        if self.cacheOnlyAction.isChecked():
+            cache_path = TileCache.defaultPath()
+            if not os.path.exists(cache_path):
+                self.iface.messageBar().pushMessage(self.plugin_name, "Tile cache is empty, prefetch tiles first", level=Qgis.Warning, duration=6 )
+                return
+            layer_url = f'type=mbtiles&url={QUrl.fromLocalFile(cache_path).toString()}'
+            layer = QgsRasterLayer(layer_url, 'OpenStreetMap (cache)', 'wms')
+        else:
+            tile_url = quote(self.tileUrl(), safe=':/')
+            layer_url = f'type=xyz&url={tile_url}&zmax={MAX_ZOOM}&zmin=0&crs=EPSG3857'
+            layer = QgsRasterLayer(layer_url, 'OpenStreetMap', 'wms')  
 
         if layer.isValid():
             QgsProject.instance().addMapLayer(layer)
@@ -205,6 +508,78 @@ class MapToolsPlugin:
             
         # TODO: Add layer under all other layers and set resampling
         # https://qgis.org/pyqgis/master/gui/QgsLayerTreeViewDefaultActions.html#qgis.gui.QgsLayerTreeViewDefaultActions.actionMoveToBottom
+
+    def tileUrl(self):
+        """URL template of the basemap tiles, with {z}, {x} and {y}."""
+        from .tile_cache import DEFAULT_TILE_URL
+        return QgsSettings().value("maptools/tile_url", DEFAULT_TILE_URL)
+
+    def setTileUrl(self):
+        """Set the URL template of the basemap tiles, an empty URL restores OpenStreetMap."""
+        from .tile_cache import DEFAULT_TILE_URL
+        url, ok = QInputDialog.getText(None, "Tile URL", "URL of the tiles with {z}, {x} and {y}:", QLineEdit.Normal, self.tileUrl())
+        if ok:
+            QgsSettings().setValue("maptools/tile_url", url.strip() or DEFAULT_TILE_URL)
+
+    def setCacheOnly(self, enabled):
+        QgsSettings().setValue("maptools/tile_cache_only", enabled)
+
+    def prefetchTiles(self):
+        """Download the tiles of the map extent into the tile cache in a background task.
+        
+        The zoom levels start at the current scale, the number of further
+        levels is the setting maptools/prefetch_zoom_levels. The tiles are
+        limited by maptools/prefetch_max_tiles. The tile usage policy of
+        OpenStreetMap forbids bulk downloads, so only a tile URL set by the
+        user is prefetched.
+        """
+        from .tile_cache import MAX_ZOOM, TileCache, TilePrefetchTask, allows_prefetch, tile_count, zoom_for_scale
+        
+        if not allows_prefetch(self.tileUrl()):
+            self.iface.messageBar().pushMessage(self.plugin_name, "The OpenStreetMap tile usage policy forbids prefetching tiles, set the URL of your own or a permitting tile server first", level=Qgis.Warning, duration=6 )
+            return
+        
+        if self.prefetchTask is not None:
+            self.iface.messageBar().pushMessage(self.plugin_name, "Tiles are already prefetched", level=Qgis.Warning, duration=6 )
+            return
+        
+        extent = self.outputExtent()
+        if extent is None:
+            self.iface.messageBar().pushMessage(self.plugin_name, "Map extent can not be transformed to WGS84", level=Qgis.Warning, duration=6 )
+            return
+        
+        settings = QgsSettings()
+        zoom_min = zoom_for_scale(self.iface.mapCanvas().scale())
+        zoom_max = min(MAX_ZOOM, zoom_min + settings.value("maptools/prefetch_zoom_levels", 2, type=int))
+        max_tiles = settings.value("maptools/prefetch_max_tiles", 5000, type=int)
+        max_bytes = settings.value("maptools/tile_cache_mb", 500, type=int) * 2 ** 20
+        
+        count = tile_count(extent, zoom_min, zoom_max)
+        if count > max_tiles:
+            self.iface.messageBar().pushMessage(self.plugin_name, f"Extent needs {count} tiles, more than {max_tiles}, zoom in", level=Qgis.Warning, duration=6 )
+            return
+        
+        self.prefetchTask = TilePrefetchTask(TileCache.defaultPath(), self.tileUrl(), extent, zoom_min, zoom_max, max_bytes)
+        self.prefetchTask.taskCompleted.connect(self.prefetchFinished)
+        self.prefetchTask.taskTerminated.connect(self.prefetchFinished)
+        QgsApplication.taskManager().addTask(self.prefetchTask)
+
+    def prefetchFinished(self):
+        task = self.prefetchTask
+        self.prefetchTask = None
+        
+        if task.status() != task.Complete:
+            message = f"Prefetch failed: {task.error}" if task.error else "Prefetch cancelled"
+            self.iface.messageBar().pushMessage(self.plugin_name, message, level=Qgis.Warning, duration=6 )
+            return
+        
+        self.iface.mapCanvas().refresh()
+        
+        message = f"Prefetched {task.downloaded} tiles, {task.cached} already cached"
+        if task.failed:
+            self.iface.messageBar().pushMessage(self.plugin_name, f"{message}, {task.failed} failed: {task.error}", level=Qgis.Warning, duration=6 )
+        else:
+            self.iface.messageBar().pushMessage(self.plugin_name, message, level=Qgis.Success, duration=3)
         
     def loadQML(self):
         """Load QML layer style from file
@@ -216,13 +591,80 @@ class MapToolsPlugin:
         filepath, extension = (dialog.getOpenFileName(None, "Load QGIS-Style from QML", home_dir, "*.qml")) 
         
         if filepath.endswith(".qml"):
-            layer.loadNamedStyle(filepath)
-            layer.triggerRepaint()
-            
-            self.iface.messageBar().pushMessage(self.plugin_name, f"Loaded style for layer '{layer.name()}'", level=Qgis.Success, duration=3)
+            self.applyStyles([(layer, filepath)])
+        
+        else:
+            self.iface.messageBar().pushMessage(self.plugin_name, "No QML style selected!", level=Qgis.Warning, duration=6 )
+
+    def loadQMLSelected(self):
+        """Load one QML layer style from file for all selected layers
+        """
+        
+        layers = self.iface.layerTreeView().selectedLayers()
+        if len(layers) == 0:
+            self.iface.messageBar().pushMessage(self.plugin_name, "No selected layer(s).", level=Qgis.Warning, duration=6 )
+            return
+        
+        home_dir = str(QStandardPaths.writableLocation(QStandardPaths.HomeLocation))
+        filepath, extension = QFileDialog.getOpenFileName(None, f"Load QGIS-Style from QML for {len(layers)} layers", home_dir, "*.qml")
+        
+        if filepath.endswith(".qml"):
+            self.applyStyles([(layer, filepath) for layer in layers])
         
         else:
             self.iface.messageBar().pushMessage(self.plugin_name, "No QML style selected!", level=Qgis.Warning, duration=6 )
+
+    def loadQMLFolder(self):
+        """Load QML layer styles from a folder, the file name matches the layer name
+        
+        The selected layers are styled, or all layers of the project if none
+        is selected.
+        """
+        
+        home_dir = str(QStandardPaths.writableLocation(QStandardPaths.HomeLocation))
+        folder = QFileDialog.getExistingDirectory(None, "Load QGIS-Styles from folder", home_dir)
+        if not folder:
+            return
+        
+        from .qml_styles import styles_by_name
+        styles = styles_by_name(folder)
+        layers = self.iface.layerTreeView().selectedLayers() or list(QgsProject.instance().mapLayers().values())
+        
+        pairs = [(layer, styles[layer.name().casefold()]) for layer in layers if layer.name().casefold() in styles]
+        if pairs:
+            self.applyStyles(pairs)
+        else:
+            self.iface.messageBar().pushMessage(self.plugin_name, "No QML style matches a layer name!", level=Qgis.Warning, duration=6 )
+
+    def applyStyles(self, pairs):
+        """Apply QML files to layers, each file is parsed once, and refresh the canvas once."""
+        from .qml_styles import StyleCache, apply_style
+        
+        if self.styleCache is None:
+            self.styleCache = StyleCache()
+        
+        applied = 0
+        failed = []
+        for layer, filepath in pairs:
+            try:
+                error = apply_style(layer, self.styleCache.document(filepath))
+            except (OSError, ValueError) as exception:
+                error = str(exception)
+            
+            if error:
+                failed.append(f"{layer.name()} ({error})")
+            else:
+                self.iface.layerTreeView().refreshLayerSymbology(layer.id())
+                applied += 1
+        
+        self.iface.mapCanvas().refresh()
+        
+        if failed:
+            self.iface.messageBar().pushMessage(self.plugin_name, f"Loaded style for {applied} layer(s), failed: {', '.join(failed)}", level=Qgis.Warning, duration=6 )
+        elif applied == 1:
+            self.iface.messageBar().pushMessage(self.plugin_name, f"Loaded style for layer '{pairs[0][0].name()}'", level=Qgis.Success, duration=3)
+        else:
+            self.iface.messageBar().pushMessage(self.plugin_name, f"Loaded style for {applied} layers", level=Qgis.Success, duration=3)
             
     def saveQML(self):
         """ Save layer style to QML-file"""
@@ -233,27 +675,70 @@ class MapToolsPlugin:
         home_dir = str(QStandardPaths.writableLocation(QStandardPaths.HomeLocation))
         filepath, extension = (dialog.getSaveFileName(None, "Save QGIS-Style as QML", home_dir, "*.qml"))
         if filepath:
-            layer.saveNamedStyle(filepath + ".qml")
+            if not filepath.endswith(".qml"):
+                filepath += ".qml"
+            layer.saveNamedStyle(filepath)
             self.iface.messageBar().pushMessage(self.plugin_name, f"Saved style for layer '{layer.name()}'", level=Qgis.Success, duration=3)
+
+    def saveQMLSelected(self):
+        """ Save layer styles of the selected layers to QML-files in a folder, named by layer"""
+        
+        layers = self.iface.layerTreeView().selectedLayers()
+        if len(layers) == 0:
+            self.iface.messageBar().pushMessage(self.plugin_name, "No selected layer(s).", level=Qgis.Warning, duration=6 )
+            return
+        
+        home_dir = str(QStandardPaths.writableLocation(QStandardPaths.HomeLocation))
+        folder = QFileDialog.getExistingDirectory(None, f"Save QGIS-Styles of {len(layers)} layers to folder", home_dir)
+        if not folder:
+            return
         
-    def copyExtent(self):
+        from .qml_styles import style_file_name
+        used = set()
+        failed = []
+        for layer in layers:
+            message, ok = layer.saveNamedStyle(os.path.join(folder, style_file_name(layer.name(), used)))
+            if not ok:
+                failed.append(f"{layer.name()} ({message})")
+        
+        if failed:
+            self.iface.messageBar().pushMessage(self.plugin_name, f"Saved style for {len(layers) - len(failed)} layer(s), failed: {', '.join(failed)}", level=Qgis.Warning, duration=6 )
+        else:
+            self.iface.messageBar().pushMessage(self.plugin_name, f"Saved style for {len(layers)} layers to {folder}", level=Qgis.Success, duration=3)
+        
+    def copyExtent(self, extent_format=EXTENT_BBOX):
         """Copy extent from extent widget to clipboard
+        
+        The extent of the widget is in the output crs, the bounding box in
+        project crs is taken from the map canvas.
         """
         
-        ouputBbox = ""
+        if self.extentWidget is None:
+            self.initExtentWidget()
+        elif self.extentDirty or self.extentTimer.isActive():
+            self.updateExtentWidget(force=True)
         
-        # WKT
-        # print(self.extentWidget.outputExtent().asWktCoordinates())
-        # TODO: Select Bbox typ
+        if extent_format == EXTENT_PROJECT:
+            extent = self.iface.mapCanvas().extent()
+        else:
+            extent = self.extentWidget.outputExtent()
+        
+        if extent_format == EXTENT_WKT:
+            ouputBbox = extent.asWktPolygon()
         
-        # minx, miny, maxx, maxy
-        ouputBbox = str(round(self.extentWidget.outputExtent().xMinimum(), 4)) + ", " + \
-            str(round(self.extentWidget.outputExtent().yMinimum(), 4)) + ", " + \
-            str(round(self.extentWidget.outputExtent().xMaximum(), 4)) + ", " + \
-            str(round(self.extentWidget.outputExtent().yMaximum(), 4))   
+        elif extent_format == EXTENT_GEOJSON:
+            ouputBbox = json.dumps({"bbox": [
+                round(extent.xMinimum(), 6),
+                round(extent.yMinimum(), 6),
+                round(extent.xMaximum(), 6),
+                round(extent.yMaximum(), 6)
+            ]})
+        
+        else:
+            # minx, miny, maxx, maxy
+            ouputBbox = ", ".join(str(round(value, 4)) for value in (extent.xMinimum(), extent.yMinimum(), extent.xMaximum(), extent.yMaximum()))
         
         clipboard = QApplication.clipboard()
         clipboard.setText(ouputBbox)   
         
-        self.iface.messageBar().pushMessage(self.plugin_name, "Copied extent to clipboard", level=Qgis.Success, duration=3)    
-        
\ No newline at end of file
+        self.iface.messageBar().pushMessage(self.plugin_name, f"Copied extent as {EXTENT_FORMAT_NAMES[extent_format]} to clipboard", level=Qgis.Success, duration=3)    
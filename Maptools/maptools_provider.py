@@ -3,8 +3,6 @@ from qgis.PyQt.QtGui import QIcon
 
 import os
 
-from .photocoding import PhotoCodingAlgorithm
-
 class MaptoolsAlgorithms(QgsProcessingProvider):
 
     def __init__(self):
@@ -12,6 +10,7 @@ class MaptoolsAlgorithms(QgsProcessingProvider):
         Default constructor.
         """
         QgsProcessingProvider.__init__(self)
+        self.providerIcon = None
 
     def unload(self):
         """
@@ -22,9 +21,17 @@ class MaptoolsAlgorithms(QgsProcessingProvider):
 
     def loadAlgorithms(self):
         """
-        Loads all algorithms belonging to this provider.
+        Loads all algorithms belonging to this provider. QGIS loads the
+        provider at startup, so the algorithm modules only import Qt and QGIS
+        here, NumPy and the photo readers are imported when they run.
         """
+        from .photocoding import PhotoCodingAlgorithm
+        from .photocoding_batch import PhotoCodingBatchAlgorithm
+        from .photoimport import PhotoImportAlgorithm
+
         self.addAlgorithm(PhotoCodingAlgorithm())
+        self.addAlgorithm(PhotoCodingBatchAlgorithm())
+        self.addAlgorithm(PhotoImportAlgorithm())
 
     def id(self):
         """
@@ -52,9 +59,9 @@ class MaptoolsAlgorithms(QgsProcessingProvider):
         Should return a QIcon which is used for your provider inside
         the Processing toolbox.
         """
-        print(self.svgIconPath())
-
-        return QIcon(self.svgIconPath())
+        if self.providerIcon is None:
+            self.providerIcon = QIcon(self.svgIconPath())
+        return self.providerIcon
 
     def longName(self):
         """
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+
+import os
+from typing import Iterator, Optional
+
+# File extensions of the supported photo formats
+PHOTO_FORMATS = [
+    ("JPEG (*.jpg, *.jpeg)", (".jpg", ".jpeg")),
+    ("TIFF (*.tif, *.tiff)", (".tif", ".tiff")),
+    ("DNG (*.dng)", (".dng",)),
+]
+
+class PhotoDiscovery:
+    """
+    Streams the photos of a folder, optionally including all subfolders.
+
+    Folders are scanned one after another while the photos are consumed.
+    The stat results of the scan are handed on, so the files are not
+    touched again. The total number of photos is estimated from the
+    folders scanned so far and gets exact once all folders are scanned.
+    An excluded subfolder, e.g. the output folder of earlier runs inside
+    the input folder, is not scanned.
+    """
+
+    def __init__(self, folder: str, extensions: tuple, recursive: bool = False, exclude: Optional[str] = None):
+        self.folder = folder
+        self.extensions = tuple(extension.lower() for extension in extensions)
+        self.recursive = recursive
+        self.exclude = os.path.normcase(os.path.realpath(exclude)) if exclude else None
+
+        self.discovered = 0
+        self.scanned_folders = 0
+        self.pending_folders = 0
+
+    def __iter__(self) -> Iterator[tuple[str, str, os.stat_result]]:
+        """
+        Yields relative path, path and stat result of each photo, sorted by
+        name within a folder.
+        """
+
+        pending = [self.folder]
+        self.pending_folders = 1
+
+        while pending:
+            folder = pending.pop()
+
+            photos = []
+            subfolders = []
+            with os.scandir(folder) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        if self.recursive and not self.excluded(entry.path):
+                            subfolders.append(entry.path)
+                    elif entry.is_file() and entry.name.lower().endswith(self.extensions):
+                        photos.append(entry)
+
+            # Depth first in name order, so the order is the same on every run
+            pending.extend(sorted(subfolders, reverse=True))
+            photos.sort(key=lambda entry: entry.name)
+
+            self.scanned_folders += 1
+            self.pending_folders = len(pending)
+            self.discovered += len(photos)
+
+            for entry in photos:
+                yield os.path.relpath(entry.path, self.folder), entry.path, entry.stat()
+
+    def excluded(self, folder: str) -> bool:
+        return self.exclude is not None and os.path.normcase(os.path.realpath(folder)) == self.exclude
+
+    def estimatedTotal(self) -> int:
+        """
+        Returns the estimated number of photos, based on the average number
+        of photos in the folders scanned so far.
+        """
+        if self.scanned_folders == 0:
+            return 0
+        return self.discovered + round(self.pending_folders * self.discovered / self.scanned_folders)
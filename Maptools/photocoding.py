@@ -1,9 +1,12 @@
 # -*- coding: utf-8 -*-
 
 from typing import Any, Optional
+import json
 import os
 import shutil
-from PyQt5.QtCore import QDateTime, Qt
+import time
+from functools import lru_cache
+from PyQt5.QtCore import QDateTime, QVariant, Qt
 from qgis.core import (
     QgsProcessing,
     QgsProcessingAlgorithm,
@@ -11,15 +14,138 @@ from qgis.core import (
     QgsProcessingFeedback,
     QgsProcessingParameterFeatureSource,
     QgsProcessingParameterField,
-    QgsFeatureRequest,
     QgsProcessingParameterFolderDestination,
     QgsProcessingParameterFile,
-    QgsCoordinateTransform,
-    QgsCoordinateReferenceSystem,
     QgsExifTools,
-    QgsProcessingParameterNumber
+    QgsProcessingParameterNumber,
+    QgsProcessingParameterBoolean,
+    QgsProcessingParameterDefinition,
+    QgsProcessingParameterEnum,
+    QgsProcessingOutputFile,
+    QgsProcessingOutputNumber,
+    QgsProcessingParameterFeatureSink,
+    QgsCoordinateReferenceSystem,
+    QgsFeature,
+    QgsFeatureSink,
+    QgsField,
+    QgsFields,
+    QgsGeometry,
+    QgsPointXY,
+    QgsWkbTypes
 )
 
+from .photo_discovery import PHOTO_FORMATS, PhotoDiscovery
+from .run_journal import RunJournal
+from .stage_timer import StageTimer
+from .xmp_sidecar import write_sidecar
+
+# Output modes
+COPY = 0
+IN_PLACE = 1
+SIDECAR = 2
+NO_IMAGES = 3
+
+# Match methods
+CLOSEST = 0
+INTERPOLATE = 1
+
+# Stages timed for the run report
+STAGES = ["discovery", "index", "transform", "read", "lookup", "copy", "tag"]
+
+@lru_cache(maxsize=None)
+def read_help(name: str) -> str:
+    """
+    Returns the content of a file in help_files, read once per session. An
+    empty string is returned if the file does not exist.
+    """
+    file = os.path.join(os.path.dirname(__file__), "help_files", name)
+    if not os.path.exists(file):
+        return ""
+    with open(file, encoding="utf-8") as helpfile:
+        return helpfile.read()
+
+def read_timestamp(path: str) -> Optional[QDateTime]:
+    """
+    Returns the time a photo was taken or None if the tag is missing or the
+    file can not be read.
+
+    Only the EXIF header is read. QgsExifTools is used as fallback for files
+    the header reader does not understand, with DateTimeOriginal before
+    DateTime like the header reader.
+    """
+    from . import exif_header
+
+    try:
+        taken = exif_header.timestamp_tags(exif_header.read_tags(path))
+    except exif_header.UnsupportedLayout:
+        taken = QgsExifTools.readTag(path, "Exif.Photo.DateTimeOriginal")
+        if not isinstance(taken, QDateTime) or not taken.isValid():
+            taken = QgsExifTools.readTag(path, "Exif.Image.DateTime")
+    except OSError:
+        return None
+    else:
+        if taken is None:
+            return None
+        taken = exif_header.to_datetime(*taken)
+
+    if not isinstance(taken, QDateTime) or not taken.isValid():
+        return None
+    return taken
+
+def output_path(relative_path: str, folder_in: str, folder_out: str, mode: int) -> str:
+    """
+    Returns the path the position of a photo is written to. Subfolders of
+    the input folder are mirrored in the output folder.
+    """
+    if mode == IN_PLACE:
+        return os.path.join(folder_in, relative_path)
+    if mode == SIDECAR:
+        return os.path.join(folder_out, os.path.splitext(relative_path)[0] + ".xmp")
+    return os.path.join(folder_out, relative_path)
+
+def read_cached_timestamp(photo: tuple) -> tuple:
+    """
+    Reads the timestamp of a photo unless it was found in the cache. The
+    seconds spent reading are appended to the photo.
+    """
+    relative_path, path, stat, cached, taken = photo
+    started = time.perf_counter()
+    if not cached:
+        taken = read_timestamp(path)
+    return relative_path, path, stat, cached, taken, time.perf_counter() - started
+
+def write_photo(job: tuple) -> tuple[bool, float, float]:
+    """
+    Writes the position to a photo, depending on the output mode to a copy
+    in the output folder, the photo itself or a XMP sidecar file. Returns
+    if the position was written and the seconds spent copying and tagging.
+    """
+    src_path, dst_path, point, altitude, mode = job
+
+    started = time.perf_counter()
+
+    if mode != IN_PLACE:
+        os.makedirs(os.path.dirname(dst_path), exist_ok=True)
+
+    if mode == COPY:
+        shutil.copy2(src_path, dst_path)
+
+    copied = time.perf_counter()
+
+    if mode == SIDECAR:
+        write_sidecar(dst_path, point, altitude)
+        referenced = True
+
+    else:
+        # Write coordinates and altitude to the image at once
+        details = QgsExifTools.GeoTagDetails()
+        if altitude is not None:
+            details.elevation = altitude
+
+        referenced = QgsExifTools.geoTagImage(dst_path, point, details)
+
+    return referenced, copied - started, time.perf_counter() - copied
+
 class PhotoCodingAlgorithm(QgsProcessingAlgorithm):
     """
     Correlation of photos by timestamp.
@@ -31,8 +157,31 @@ class PhotoCodingAlgorithm(QgsProcessingAlgorithm):
     POINTS_TIMESTAMP = "POINTS_TIMESTAMP"
     OFFSET = "OFFSET"
     ELEVATION_OFFSET = "ELEVATION_OFFSET"
+    MATCH_TOLERANCE = "MATCH_TOLERANCE"
+    MATCH_METHOD = "MATCH_METHOD"
+    MAX_GAP = "MAX_GAP"
     FOLDER_IN = "FOLDER_IN"
     FOLDER_OUT = "FOLDER_OUT"
+    FORMATS = "FORMATS"
+    RECURSIVE = "RECURSIVE"
+    NUMBER_OF_WORKERS = "NUMBER_OF_WORKERS"
+    USE_CACHE = "USE_CACHE"
+    CACHE_SIZE = "CACHE_SIZE"
+    CLEAR_CACHE = "CLEAR_CACHE"
+    RESUME = "RESUME"
+    OUTPUT_MODE = "OUTPUT_MODE"
+    OUTPUT = "OUTPUT"
+    REPORT = "REPORT"
+    IMAGES_PROCESSED = "IMAGES_PROCESSED"
+    IMAGES_REFERENCED = "IMAGES_REFERENCED"
+    IMAGES_SKIPPED = "IMAGES_SKIPPED"
+    IMAGES_WITHOUT_TIMESTAMP = "IMAGES_WITHOUT_TIMESTAMP"
+    IMAGES_UNMATCHED = "IMAGES_UNMATCHED"
+    IMAGES_MULTIPLE_MATCHES = "IMAGES_MULTIPLE_MATCHES"
+    PHOTOS_PER_SECOND = "PHOTOS_PER_SECOND"
+
+    # Cache of track indexes, set by the batch algorithm for its jobs
+    track_indexes = None
 
     def name(self) -> str:
         """
@@ -61,13 +210,7 @@ class PhotoCodingAlgorithm(QgsProcessingAlgorithm):
         return "geocoding"
 
     def shortHelpString(self):
-
-        file = os.path.join(os.path.dirname(__file__), "help_files", "photocoding.html")
-        if not os.path.exists(file):
-            return "Correlation of photos by timestamp."
-        with open(file) as helpfile:
-            help = helpfile.read()
-        return help  
+        return read_help("photocoding.html") or "Correlation of photos by timestamp."
 
 
     def initAlgorithm(self, config: Optional[dict[str, Any]] = None):
@@ -111,6 +254,38 @@ class PhotoCodingAlgorithm(QgsProcessingAlgorithm):
             )
         )
 
+        self.addParameter(
+            QgsProcessingParameterEnum(
+                self.MATCH_METHOD,
+                "Match method",
+                options=[
+                    "Closest point within tolerance",
+                    "Linear interpolation between points"
+                ],
+                defaultValue=CLOSEST
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterNumber(
+                self.MATCH_TOLERANCE,
+                "Match tolerance in seconds",
+                type=QgsProcessingParameterNumber.Double,
+                minValue=0,
+                defaultValue=0
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterNumber(
+                self.MAX_GAP,
+                "Maximum gap between points for interpolation in seconds",
+                type=QgsProcessingParameterNumber.Double,
+                minValue=0,
+                defaultValue=10
+            )
+        )
+
         self.addParameter(
             QgsProcessingParameterFile(
                 self.FOLDER_IN,
@@ -119,6 +294,24 @@ class PhotoCodingAlgorithm(QgsProcessingAlgorithm):
             )
         )
 
+        self.addParameter(
+            QgsProcessingParameterEnum(
+                self.FORMATS,
+                "Photo formats",
+                options=[name for name, extensions in PHOTO_FORMATS],
+                allowMultiple=True,
+                defaultValue=[0]
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterBoolean(
+                self.RECURSIVE,
+                "Include subfolders",
+                defaultValue=False
+            )
+        )
+
         self.addParameter(
             QgsProcessingParameterFolderDestination(
                 self.FOLDER_OUT,
@@ -126,6 +319,85 @@ class PhotoCodingAlgorithm(QgsProcessingAlgorithm):
             )
         )    
 
+        self.addParameter(
+            QgsProcessingParameterEnum(
+                self.OUTPUT_MODE,
+                "Output mode",
+                options=[
+                    "Copy photos to output folder",
+                    "Tag photos in place",
+                    "Write XMP sidecar files to output folder",
+                    "No image output"
+                ],
+                defaultValue=COPY
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterFeatureSink(
+                self.OUTPUT,
+                "Photo locations",
+                QgsProcessing.TypeVectorPoint,
+                optional=True,
+                createByDefault=False
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterBoolean(
+                self.RESUME,
+                "Resume previous run (skip finished photos)",
+                defaultValue=False
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterNumber(
+                self.NUMBER_OF_WORKERS,
+                "Number of workers",
+                type=QgsProcessingParameterNumber.Integer,
+                minValue=1,
+                defaultValue=1
+            )
+        )
+
+        use_cache = QgsProcessingParameterBoolean(
+            self.USE_CACHE,
+            "Cache timestamps of photos",
+            defaultValue=True
+        )
+        use_cache.setFlags(use_cache.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(use_cache)
+
+        cache_size = QgsProcessingParameterNumber(
+            self.CACHE_SIZE,
+            "Maximum number of cached photos",
+            type=QgsProcessingParameterNumber.Integer,
+            minValue=0,
+            defaultValue=100000
+        )
+        cache_size.setFlags(cache_size.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(cache_size)
+
+        clear_cache = QgsProcessingParameterBoolean(
+            self.CLEAR_CACHE,
+            "Clear cache before reading photos",
+            defaultValue=False
+        )
+        clear_cache.setFlags(clear_cache.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(clear_cache)
+
+        self.addOutput(QgsProcessingOutputFile(self.REPORT, "Run report"))
+        self.addOutput(QgsProcessingOutputNumber(self.IMAGES_PROCESSED, "Images processed"))
+        self.addOutput(QgsProcessingOutputNumber(self.IMAGES_REFERENCED, "Images referenced"))
+        self.addOutput(QgsProcessingOutputNumber(self.IMAGES_SKIPPED, "Images skipped"))
+        self.addOutput(QgsProcessingOutputNumber(self.IMAGES_WITHOUT_TIMESTAMP, "Images without timestamp"))
+        self.addOutput(QgsProcessingOutputNumber(self.IMAGES_UNMATCHED, "Images without matching point"))
+        self.addOutput(QgsProcessingOutputNumber(self.IMAGES_MULTIPLE_MATCHES, "Images with several matching points"))
+        self.addOutput(QgsProcessingOutputNumber(self.PHOTOS_PER_SECOND, "Photos per second"))
+        for stage in STAGES:
+            self.addOutput(QgsProcessingOutputNumber(f"TIME_{stage.upper()}", f"Time for {stage} in seconds"))
+
     def processAlgorithm(
         self,
         parameters: dict[str, Any],
@@ -136,90 +408,282 @@ class PhotoCodingAlgorithm(QgsProcessingAlgorithm):
         Here is where the processing itself takes place.
         """
 
+        # Imported on the first run, so loading the provider at startup
+        # does not import NumPy and the photo readers
+        from .exif_cache import ExifCache
+        from .track_index import TrackIndex
+        from .worker_pool import map_ordered
+
+        started = time.perf_counter()
+        timer = StageTimer()
+
         # Retrieve the feature source and sink.
 
         points = self.parameterAsSource(parameters, self.POINTS, context)
         points_timestamp_field = self.parameterAsString(parameters, self.POINTS_TIMESTAMP, context)
         offset = self.parameterAsInt(parameters, self.OFFSET, context)
         elevation_offset = self.parameterAsDouble(parameters, self.ELEVATION_OFFSET, context)
+        match_tolerance = self.parameterAsDouble(parameters, self.MATCH_TOLERANCE, context)
+        match_method = self.parameterAsEnum(parameters, self.MATCH_METHOD, context)
+        max_gap = self.parameterAsDouble(parameters, self.MAX_GAP, context)
         folder_in = self.parameterAsString(parameters, self.FOLDER_IN, context)
         folder_out = self.parameterAsString(parameters, self.FOLDER_OUT, context)
-
-        # Apply selection
-        points = points.materialize(QgsFeatureRequest(), feedback)
-
-        # Get the CRS of the points layer
-        points_crs = points.sourceCrs()
+        workers = self.parameterAsInt(parameters, self.NUMBER_OF_WORKERS, context)
+        use_cache = self.parameterAsBoolean(parameters, self.USE_CACHE, context)
+        cache_size = self.parameterAsInt(parameters, self.CACHE_SIZE, context)
+        clear_cache = self.parameterAsBoolean(parameters, self.CLEAR_CACHE, context)
+        resume = self.parameterAsBoolean(parameters, self.RESUME, context)
+        output_mode = self.parameterAsEnum(parameters, self.OUTPUT_MODE, context)
+        formats = self.parameterAsEnums(parameters, self.FORMATS, context)
+        recursive = self.parameterAsBoolean(parameters, self.RECURSIVE, context)
+
+        # Source of the points, the layer name alone does not identify the track
+        points_layer = self.parameterAsVectorLayer(parameters, self.POINTS, context)
+        if points_layer is not None:
+            points_source = points_layer.source()
+        else:
+            points_source = self.parameterAsString(parameters, self.POINTS, context)
+
+        def build_index():
+            # Read the timestamps once and sort them for the lookup, the
+            # source already applies the selection
+            return TrackIndex(points, points_timestamp_field, context.transformContext(), feedback, timer)
+
+        # Jobs of a batch share the indexes of their tracks
+        if self.track_indexes is not None:
+            key = (points_source, points_timestamp_field)
+            index = self.track_indexes.get(key, build_index)
+        else:
+            index = build_index()
+
+        tolerance = int(round(match_tolerance * 1000))
 
         images_processed = 0
         images_referenced = 0
 
+        # Optional point layer with the location of every matched photo
+        fields = QgsFields()
+        fields.append(QgsField("path", QVariant.String))
+        fields.append(QgsField("timestamp", QVariant.DateTime))
+        fields.append(QgsField("point_id", QVariant.LongLong))
+        fields.append(QgsField("time_delta", QVariant.Double))
+        fields.append(QgsField("altitude", QVariant.Double))
+
+        sink, dest_id = self.parameterAsSink(
+            parameters,
+            self.OUTPUT,
+            context,
+            fields,
+            QgsWkbTypes.Point,
+            QgsCoordinateReferenceSystem("EPSG:4326")
+        )
+
         # If the folder does not exist, create it
         if not os.path.exists(folder_out):
             os.makedirs(folder_out)
 
-        files = os.listdir(folder_in)
-        file_count = len(files)
-
-
-        # Compute the number of steps to display within the progress bar and
-        
-        total = 100.0 / file_count if file_count else 0
-
-
-        for current, file in enumerate(files):
-            
-            if not os.path.isfile(os.path.join(folder_in, file)):
-                continue
-            if not file.lower().endswith((".jpg", ".jpeg")):
-                continue
-
-            with open(os.path.join(folder_in, file) , "rb") as image:
-
-                taken = QgsExifTools.readTag(os.path.join(folder_in, file), "Exif.Image.DateTime")
+        # Photos are discovered while they are read
+        extensions = tuple(extension for option in formats for extension in PHOTO_FORMATS[option][1])
+        # The output folder may be inside the input folder, its copies are
+        # not read again on the next run
+        discovery = PhotoDiscovery(folder_in, extensions, recursive, exclude=folder_out)
+
+        # Photos finished by a previous run are skipped when resuming
+        settings = {
+            "points": points_source,
+            "timestamp_field": points_timestamp_field,
+            "offset": offset,
+            "elevation_offset": elevation_offset,
+            "match_tolerance": match_tolerance,
+            "match_method": match_method,
+            "max_gap": max_gap,
+            "output_mode": output_mode
+        }
+        journal = RunJournal(folder_out, settings, resume)
+
+        # Timestamps of unchanged photos are taken from the cache
+        cache = None
+        if use_cache or clear_cache:
+            cache = ExifCache(ExifCache.defaultPath(), cache_size)
+            if clear_cache:
+                cache.clear()
+                feedback.pushInfo("EXIF cache cleared")
+            if not use_cache:
+                cache.close()
+                cache = None
+
+        images_skipped = 0
+        images_cached = 0
+        images_without_timestamp = 0
+        images_unmatched = 0
+        images_multiple_matches = 0
+
+        def add_location(path, location):
+            feature = QgsFeature(fields)
+            feature.setGeometry(QgsGeometry.fromPointXY(QgsPointXY(location["x"], location["y"])))
+            feature.setAttributes([
+                path,
+                QDateTime.fromString(location["timestamp"], Qt.ISODateWithMs),
+                location["point_id"],
+                location["time_delta"],
+                location["altitude"]
+            ])
+            sink.addFeature(feature, QgsFeatureSink.FastInsert)
+
+        def photos():
+            nonlocal images_skipped
+            for relative_path, path, stat in timer.iterate("discovery", discovery):
+                dst_path = output_path(relative_path, folder_in, folder_out, output_mode)
+                if resume and output_mode != NO_IMAGES and journal.isDone(path, stat, dst_path):
+                    feedback.pushInfo(f"Skip {relative_path}, matched with point {journal.point(dst_path)} before")
+                    images_skipped += 1
+                    # The photo locations cover the skipped photos as well
+                    location = journal.location(dst_path)
+                    if sink is not None and location is not None:
+                        add_location(path, location)
+                    continue
+
+                cached, taken = cache.get(path, stat) if cache is not None else (False, None)
+                yield relative_path, path, stat, cached, taken
+
+        timestamped = []
+
+        # Read the timestamps of the photos on the worker pool
+        try:
+            for relative_path, path, stat, cached, taken, seconds in map_ordered(read_cached_timestamp, photos(), workers, feedback):
 
                 images_processed += 1
+                timer.add("read", seconds)
+
+                # Reading and writing are spread over the progress bar in two
+                # halves, the number of photos is refined while scanning
+                feedback.setProgress(int((images_processed + images_skipped) * 50.0 / max(discovery.estimatedTotal(), 1)))
+
+                if cached:
+                    images_cached += 1
+                elif cache is not None:
+                    cache.put(path, stat, taken)
+
+                if taken is None:
+                    feedback.pushInfo(f"No timestamp found in {relative_path}")
+                    images_without_timestamp += 1
+                    continue
+
+                timestamped.append((relative_path, path, taken))
+
+        finally:
+            if cache is not None:
+                cache.close()
+
+        # Match all photos at once
+        with timer.measure("lookup"):
+            msecs = [taken.toMSecsSinceEpoch() + offset * 1000 for _, _, taken in timestamped]
+            # Without tolerance photos match at whole seconds as before, the
+            # sub seconds of the photo are dropped
+            if match_method != INTERPOLATE and tolerance == 0:
+                msecs = [value // 1000 * 1000 for value in msecs]
+            if match_method == INTERPOLATE:
+                matched = index.interpolate(msecs, int(round(max_gap * 1000)))
+            else:
+                matched = index.match(msecs, tolerance)
+
+        jobs = []
+        matches = []
+
+        for number, (relative_path, path, taken) in enumerate(timestamped):
+
+            if not matched.found[number]:
+                images_unmatched += 1
+                continue
 
-                # Request feature by time
-                exp = f"epoch({points_timestamp_field}) = {taken.toSecsSinceEpoch() * 1000} + {offset * 1000}"
-                request = QgsFeatureRequest().setFilterExpression(exp)
-                for matching_feature in points.getFeatures(request):
-                    feedback.pushInfo(f"Match {file} with point {matching_feature.id()} at {taken.toString(Qt.DateFormat.DefaultLocaleLongDate)} ")
-                    
-                    # Check if the point is in WGS84
-                    if points_crs == QgsCoordinateReferenceSystem("EPSG:4326"):
-                        point = matching_feature.geometry().asPoint()
-                        
-                    else:
-                        dest_crs = QgsCoordinateReferenceSystem("EPSG:4326")
-                        transform = QgsCoordinateTransform(points_crs, dest_crs, context.transformContext())
-                        geom = matching_feature.geometry()
-                        geom.transform(transform)
-                        point = geom.asPoint()
-
-                    src_path = os.path.join(folder_in, file)
-                    dst_path = os.path.join(folder_out, file)
-                    shutil.copy2(src_path, dst_path)
-
-                    # Write coordinates to the image
-                    QgsExifTools.geoTagImage(os.path.join(folder_out, file), point)
-
-                    # If Z coordinate is available, set altitude
-                    if matching_feature.geometry().constGet().is3D():
-                        altitude = matching_feature.geometry().constGet().z() + elevation_offset
-                        QgsExifTools.tagImage(os.path.join(folder_out, file), "Exif.GPSInfo.GPSAltitude", altitude)
-
+            if matched.multiple[number]:
+                images_multiple_matches += 1
+
+            point_id = int(matched.ids[number])
+            feedback.pushInfo(f"Match {relative_path} with point {point_id} at {taken.toString(Qt.DateFormat.DefaultLocaleLongDate)} ")
+
+            # Position is already in WGS84, add the offset to the altitude if available
+            point = matched.point(number)
+            altitude = matched.altitude(number)
+            if altitude is not None:
+                altitude += elevation_offset
+
+            location = {
+                "timestamp": taken.toString(Qt.ISODateWithMs),
+                "x": point.x(),
+                "y": point.y(),
+                "point_id": point_id,
+                "time_delta": matched.delta(number),
+                "altitude": altitude
+            }
+
+            if sink is not None:
+                add_location(path, location)
+
+            if output_mode != NO_IMAGES:
+                jobs.append((path, output_path(relative_path, folder_in, folder_out, output_mode), point, altitude, output_mode))
+                matches.append((point_id, location))
+            else:
+                images_referenced += 1
+
+        # Copy and tag the matched photos on the worker pool, the journal
+        # records every finished photo for resuming
+        try:
+            for current, ((path, dst_path, _, _, _), (point_id, location), (referenced, copy_seconds, tag_seconds)) in enumerate(zip(jobs, matches, map_ordered(write_photo, jobs, workers, feedback))):
+                timer.add("copy", copy_seconds)
+                timer.add("tag", tag_seconds)
+
+                if referenced:
                     images_referenced += 1
+                    # Tagging in place changes the source, so stat it again
+                    journal.record(path, os.stat(path), dst_path, point_id, location)
 
+                feedback.setProgress(50 + int(current * 50.0 / len(jobs)))
 
-            feedback.setProgress(int(current * total))
+        finally:
+            journal.close()
 
+        elapsed = time.perf_counter() - started
 
         feedback.pushInfo(f"Images processed: {images_processed}")
         feedback.pushInfo(f"Images referenced: {images_referenced}")
-
-
-        return {self.FOLDER_OUT: folder_out}
+        feedback.pushInfo(f"Images skipped: {images_skipped}")
+        feedback.pushInfo(f"Timestamps from cache: {images_cached}")
+        feedback.pushInfo(f"Images without timestamp: {images_without_timestamp}")
+        feedback.pushInfo(f"Images without matching point: {images_unmatched}")
+        feedback.pushInfo(f"Images with several matching points: {images_multiple_matches}")
+
+        results = {
+            self.FOLDER_OUT: folder_out,
+            self.IMAGES_PROCESSED: images_processed,
+            self.IMAGES_REFERENCED: images_referenced,
+            self.IMAGES_SKIPPED: images_skipped,
+            self.IMAGES_WITHOUT_TIMESTAMP: images_without_timestamp,
+            self.IMAGES_UNMATCHED: images_unmatched,
+            self.IMAGES_MULTIPLE_MATCHES: images_multiple_matches,
+            self.PHOTOS_PER_SECOND: images_processed / elapsed if elapsed > 0 else 0
+        }
+        for stage in STAGES:
+            results[f"TIME_{stage.upper()}"] = timer.seconds.get(stage, 0.0)
+
+        # Write the report for monitoring the throughput
+        report_path = os.path.join(folder_out, "photocoding_report.json")
+        with open(report_path, "w", encoding="utf-8") as report:
+            json.dump({
+                "settings": settings,
+                "folder_in": folder_in,
+                "workers": workers,
+                "images_cached": images_cached,
+                "total_seconds": elapsed,
+                "stage_seconds": {stage: timer.seconds.get(stage, 0.0) for stage in STAGES},
+                "results": {key: value for key, value in results.items() if not key.startswith("TIME_")}
+            }, report, indent=2)
+
+        results[self.REPORT] = report_path
+        if sink is not None:
+            results[self.OUTPUT] = dest_id
+
+        return results
 
     def createInstance(self):
         return self.__class__()
\ No newline at end of file
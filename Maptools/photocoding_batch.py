@@ -0,0 +1,384 @@
+# -*- coding: utf-8 -*-
+
+from typing import Any, Optional
+import csv
+import json
+import math
+import os
+import time
+from PyQt5.QtCore import Qt
+from qgis.core import (
+    QgsProcessingAlgorithm,
+    QgsProcessingContext,
+    QgsProcessingException,
+    QgsProcessingFeedback,
+    QgsProcessingParameterBoolean,
+    QgsProcessingParameterEnum,
+    QgsProcessingParameterFile,
+    QgsProcessingParameterFileDestination,
+    QgsProcessingParameterNumber,
+    QgsProcessingOutputNumber
+)
+
+from .photocoding import CLOSEST, PhotoCodingAlgorithm
+
+# Manifest columns and the parameters of the photocoding algorithm they set
+MANIFEST_COLUMNS = {
+    "points": PhotoCodingAlgorithm.POINTS,
+    "timestamp_field": PhotoCodingAlgorithm.POINTS_TIMESTAMP,
+    "offset": PhotoCodingAlgorithm.OFFSET,
+    "elevation_offset": PhotoCodingAlgorithm.ELEVATION_OFFSET,
+    "folder_in": PhotoCodingAlgorithm.FOLDER_IN,
+    "folder_out": PhotoCodingAlgorithm.FOLDER_OUT,
+}
+
+REQUIRED_COLUMNS = ["points", "timestamp_field", "folder_in", "folder_out"]
+
+def read_manifest(path: str) -> list[dict[str, Any]]:
+    """
+    Reads the jobs from a CSV file with a header line or a JSON file with a
+    list of objects. Relative paths are resolved against the manifest, other
+    point sources like database connections are used as they are. Raises
+    QgsProcessingException for missing or invalid values.
+    """
+
+    if path.lower().endswith(".json"):
+        with open(path, encoding="utf-8") as manifest:
+            rows = json.load(manifest)
+    else:
+        with open(path, encoding="utf-8", newline="") as manifest:
+            rows = list(csv.DictReader(manifest))
+
+    base = os.path.dirname(os.path.abspath(path))
+    jobs = []
+    for number, row in enumerate(rows, 1):
+        missing = [column for column in REQUIRED_COLUMNS if not row.get(column)]
+        if missing:
+            raise QgsProcessingException(f"Job {number} of the manifest is missing {', '.join(missing)}")
+
+        job = {}
+        for column, parameter in MANIFEST_COLUMNS.items():
+            value = row.get(column)
+            if value in (None, ""):
+                continue
+            if column == "points":
+                value = resolve_source(str(value), base)
+            elif column in ("folder_in", "folder_out"):
+                value = os.path.join(base, os.path.expanduser(str(value)))
+            elif column == "offset":
+                value = manifest_number(value, number, column)
+                if not value.is_integer():
+                    raise QgsProcessingException(f"Job {number} of the manifest has an offset of {value}, only whole seconds are supported")
+                value = int(value)
+            elif column == "elevation_offset":
+                value = manifest_number(value, number, column)
+            job[parameter] = value
+        jobs.append(job)
+
+    return jobs
+
+def resolve_source(source: str, base: str) -> str:
+    """
+    Returns the point source with a relative file path resolved against the
+    folder of the manifest. Sources which are no existing relative file,
+    e.g. database connections, are returned unchanged.
+    """
+    path, separator, options = source.partition("|")
+    path = os.path.expanduser(path)
+    if os.path.isabs(path):
+        return path + separator + options
+    if os.path.exists(os.path.join(base, path)):
+        return os.path.join(base, path) + separator + options
+    return source
+
+def manifest_number(value: Any, number: int, column: str) -> float:
+    """
+    Returns a number of the manifest, raises QgsProcessingException naming
+    job and column if it is not a finite number.
+    """
+    try:
+        result = float(value)
+    except (TypeError, ValueError):
+        result = math.nan
+    if isinstance(value, bool) or not math.isfinite(result):
+        raise QgsProcessingException(f"Job {number} of the manifest has an invalid {column}: {value}")
+    return result
+
+class PhotoCodingBatchAlgorithm(QgsProcessingAlgorithm):
+    """
+    Correlation of photos by timestamp for many folders and tracks.
+    """
+
+    # Constants used to refer to parameters and outputs.
+
+    MANIFEST = "MANIFEST"
+    MATCH_METHOD = "MATCH_METHOD"
+    MATCH_TOLERANCE = "MATCH_TOLERANCE"
+    MAX_GAP = "MAX_GAP"
+    NUMBER_OF_JOBS = "NUMBER_OF_JOBS"
+    NUMBER_OF_WORKERS = "NUMBER_OF_WORKERS"
+    USE_CACHE = "USE_CACHE"
+    RESUME = "RESUME"
+    SUMMARY = "SUMMARY"
+    JOBS_SUCCEEDED = "JOBS_SUCCEEDED"
+    JOBS_FAILED = "JOBS_FAILED"
+
+    def name(self) -> str:
+        """
+        Returns the algorithm name, used for identifying the algorithm.
+        """
+        return "photocodingbatch"
+
+    def displayName(self) -> str:
+        """
+        Returns the translated algorithm name, which should be used for any
+        user-visible display of the algorithm name.
+        """
+        return "Correlation of photos (batch)"
+
+    def group(self) -> str:
+        """
+        Returns the name of the group this algorithm belongs to. This string
+        should be localised.
+        """
+        return "Geocoding"
+
+    def groupId(self) -> str:
+        """
+        Returns the unique ID of the group this algorithm belongs to.
+        """
+        return "geocoding"
+
+    def shortHelpString(self):
+        return (
+            "Runs the correlation of photos by timestamp for many folders, each "
+            "with its own points layer. The manifest is a CSV file with a header "
+            "line or a JSON list of objects with the columns points, "
+            "timestamp_field, folder_in and folder_out and optional offset and "
+            "elevation_offset. Relative paths are resolved against the manifest. "
+            "Jobs run in parallel, share the timestamp cache of the photos and "
+            "the index of tracks used by several jobs. A JSON summary of all "
+            "jobs is written to the summary file."
+        )
+
+    def initAlgorithm(self, config: Optional[dict[str, Any]] = None):
+        """
+        Here we define the inputs and output of the algorithm, along
+        with some other properties.
+        """
+
+        self.addParameter(
+            QgsProcessingParameterFile(
+                self.MANIFEST,
+                "Manifest of the jobs",
+                behavior=QgsProcessingParameterFile.File,
+                fileFilter="Manifest (*.csv *.json)"
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterEnum(
+                self.MATCH_METHOD,
+                "Match method",
+                options=[
+                    "Closest point within tolerance",
+                    "Linear interpolation between points"
+                ],
+                defaultValue=CLOSEST
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterNumber(
+                self.MATCH_TOLERANCE,
+                "Match tolerance in seconds",
+                type=QgsProcessingParameterNumber.Double,
+                minValue=0,
+                defaultValue=0
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterNumber(
+                self.MAX_GAP,
+                "Maximum gap between points for interpolation in seconds",
+                type=QgsProcessingParameterNumber.Double,
+                minValue=0,
+                defaultValue=10
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterNumber(
+                self.NUMBER_OF_JOBS,
+                "Number of jobs running at the same time",
+                type=QgsProcessingParameterNumber.Integer,
+                minValue=1,
+                defaultValue=2
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterNumber(
+                self.NUMBER_OF_WORKERS,
+                "Number of workers per job",
+                type=QgsProcessingParameterNumber.Integer,
+                minValue=1,
+                defaultValue=1
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterBoolean(
+                self.USE_CACHE,
+                "Cache timestamps of photos",
+                defaultValue=True
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterBoolean(
+                self.RESUME,
+                "Resume previous run (skip finished photos)",
+                defaultValue=False
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterFileDestination(
+                self.SUMMARY,
+                "Summary of the jobs",
+                fileFilter="JSON (*.json)"
+            )
+        )
+
+        self.addOutput(QgsProcessingOutputNumber(self.JOBS_SUCCEEDED, "Jobs succeeded"))
+        self.addOutput(QgsProcessingOutputNumber(self.JOBS_FAILED, "Jobs failed"))
+
+    def processAlgorithm(
+        self,
+        parameters: dict[str, Any],
+        context: QgsProcessingContext,
+        feedback: QgsProcessingFeedback,
+    ) -> dict[str, Any]:
+        """
+        Here is where the processing itself takes place.
+        """
+
+        # The track index pulls in NumPy, imported on the first run only
+        from .track_index import TrackIndexCache
+        from .worker_pool import map_ordered
+
+        started = time.perf_counter()
+
+        manifest = self.parameterAsFile(parameters, self.MANIFEST, context)
+        match_method = self.parameterAsEnum(parameters, self.MATCH_METHOD, context)
+        match_tolerance = self.parameterAsDouble(parameters, self.MATCH_TOLERANCE, context)
+        max_gap = self.parameterAsDouble(parameters, self.MAX_GAP, context)
+        number_of_jobs = self.parameterAsInt(parameters, self.NUMBER_OF_JOBS, context)
+        workers = self.parameterAsInt(parameters, self.NUMBER_OF_WORKERS, context)
+        use_cache = self.parameterAsBoolean(parameters, self.USE_CACHE, context)
+        resume = self.parameterAsBoolean(parameters, self.RESUME, context)
+        summary_path = self.parameterAsFileOutput(parameters, self.SUMMARY, context)
+
+        jobs = read_manifest(manifest)
+        feedback.pushInfo(f"Jobs in manifest: {len(jobs)}")
+
+        # Indexes of tracks used by several jobs are built once
+        track_indexes = TrackIndexCache()
+        transform_context = context.transformContext()
+
+        runs = []
+        for job in jobs:
+            algorithm = PhotoCodingAlgorithm().create()
+            algorithm.track_indexes = track_indexes
+
+            job_parameters = {
+                PhotoCodingAlgorithm.MATCH_METHOD: match_method,
+                PhotoCodingAlgorithm.MATCH_TOLERANCE: match_tolerance,
+                PhotoCodingAlgorithm.MAX_GAP: max_gap,
+                PhotoCodingAlgorithm.NUMBER_OF_WORKERS: workers,
+                PhotoCodingAlgorithm.USE_CACHE: use_cache,
+                PhotoCodingAlgorithm.RESUME: resume,
+            }
+            job_parameters.update(job)
+
+            # Cancelling the batch cancels the running jobs as well
+            job_feedback = QgsProcessingFeedback()
+            feedback.canceled.connect(job_feedback.cancel, Qt.DirectConnection)
+
+            runs.append((algorithm, job_parameters, job_feedback))
+
+        def run_job(run):
+            algorithm, job_parameters, job_feedback = run
+            if job_feedback.isCanceled():
+                return {}, False, 0.0
+
+            job_context = QgsProcessingContext()
+            job_context.setTransformContext(transform_context)
+
+            job_started = time.perf_counter()
+            results, ok = algorithm.run(job_parameters, job_context, job_feedback)
+            return results, ok, time.perf_counter() - job_started
+
+        summary_jobs = []
+        jobs_succeeded = 0
+        jobs_failed = 0
+        images_processed = 0
+        images_referenced = 0
+
+        for current, ((_, job_parameters, job_feedback), (results, ok, seconds)) in enumerate(zip(runs, map_ordered(run_job, runs, number_of_jobs, feedback))):
+            folder_in = job_parameters[PhotoCodingAlgorithm.FOLDER_IN]
+
+            if ok:
+                jobs_succeeded += 1
+                images_processed += results.get(PhotoCodingAlgorithm.IMAGES_PROCESSED, 0)
+                images_referenced += results.get(PhotoCodingAlgorithm.IMAGES_REFERENCED, 0)
+                feedback.pushInfo(
+                    f"Job {current + 1} {folder_in}: "
+                    f"{results.get(PhotoCodingAlgorithm.IMAGES_REFERENCED, 0)} of "
+                    f"{results.get(PhotoCodingAlgorithm.IMAGES_PROCESSED, 0)} images referenced"
+                )
+            else:
+                jobs_failed += 1
+                feedback.pushWarning(f"Job {current + 1} {folder_in} failed")
+
+            summary_jobs.append({
+                "parameters": {key: str(value) for key, value in job_parameters.items()},
+                "succeeded": ok,
+                "seconds": seconds,
+                "results": results,
+                "log": "" if ok else job_feedback.textLog()
+            })
+
+            feedback.setProgress(int((current + 1) * 100.0 / len(runs)))
+
+        for _, _, job_feedback in runs:
+            feedback.canceled.disconnect(job_feedback.cancel)
+
+        elapsed = time.perf_counter() - started
+
+        feedback.pushInfo(f"Jobs succeeded: {jobs_succeeded}")
+        feedback.pushInfo(f"Jobs failed: {jobs_failed}")
+        feedback.pushInfo(f"Images processed: {images_processed}")
+        feedback.pushInfo(f"Images referenced: {images_referenced}")
+
+        with open(summary_path, "w", encoding="utf-8") as summary:
+            json.dump({
+                "manifest": manifest,
+                "jobs_succeeded": jobs_succeeded,
+                "jobs_failed": jobs_failed,
+                "images_processed": images_processed,
+                "images_referenced": images_referenced,
+                "total_seconds": elapsed,
+                "jobs": summary_jobs
+            }, summary, indent=2)
+
+        return {
+            self.SUMMARY: summary_path,
+            self.JOBS_SUCCEEDED: jobs_succeeded,
+            self.JOBS_FAILED: jobs_failed
+        }
+
+    def createInstance(self):
+        return self.__class__()
@@ -0,0 +1,284 @@
+# -*- coding: utf-8 -*-
+
+from typing import Any, Optional
+import time
+from PyQt5.QtCore import QDateTime, QVariant
+from qgis.core import (
+    QgsProcessing,
+    QgsProcessingAlgorithm,
+    QgsProcessingContext,
+    QgsProcessingFeedback,
+    QgsProcessingParameterFile,
+    QgsProcessingParameterNumber,
+    QgsProcessingParameterBoolean,
+    QgsProcessingParameterEnum,
+    QgsProcessingOutputNumber,
+    QgsProcessingParameterFeatureSink,
+    QgsProcessingUtils,
+    QgsCoordinateReferenceSystem,
+    QgsExifTools,
+    QgsFeature,
+    QgsFeatureSink,
+    QgsField,
+    QgsFields,
+    QgsGeometry,
+    QgsPointXY,
+    QgsVectorDataProvider,
+    QgsWkbTypes
+)
+
+from .photo_discovery import PHOTO_FORMATS, PhotoDiscovery
+from .photocoding import read_help, read_timestamp
+
+# Features written to the sink at once
+BATCH_SIZE = 1000
+
+def read_position(photo: tuple) -> tuple:
+    """
+    Reads position and timestamp of a photo from its EXIF header. The
+    position is None for photos without GPS tags or which can not be read.
+    """
+    from . import exif_header
+
+    relative_path, path, stat = photo
+
+    try:
+        tags = exif_header.read_tags(path)
+    except OSError:
+        return relative_path, path, None, None
+    except exif_header.UnsupportedLayout:
+        # QgsExifTools reads files the header reader does not understand
+        point, ok = QgsExifTools.getGeoTag(path)
+        position = (point.x(), point.y(), point.z() if point.is3D() else None, None) if ok else None
+        return relative_path, path, position, read_timestamp(path)
+
+    position = exif_header.gps_position(tags)
+    taken = exif_header.timestamp_tags(tags)
+    if taken is not None:
+        taken = exif_header.to_datetime(*taken)
+        if not taken.isValid():
+            taken = None
+
+    return relative_path, path, position, taken
+
+class PhotoImportAlgorithm(QgsProcessingAlgorithm):
+    """
+    Point layer of photos from the GPS position in their EXIF tags.
+    """
+
+    # Constants used to refer to parameters and outputs.
+
+    FOLDER_IN = "FOLDER_IN"
+    FORMATS = "FORMATS"
+    RECURSIVE = "RECURSIVE"
+    NUMBER_OF_WORKERS = "NUMBER_OF_WORKERS"
+    SPATIAL_INDEX = "SPATIAL_INDEX"
+    OUTPUT = "OUTPUT"
+    IMAGES_PROCESSED = "IMAGES_PROCESSED"
+    IMAGES_IMPORTED = "IMAGES_IMPORTED"
+    IMAGES_WITHOUT_POSITION = "IMAGES_WITHOUT_POSITION"
+    PHOTOS_PER_SECOND = "PHOTOS_PER_SECOND"
+
+    def name(self) -> str:
+        """
+        Returns the algorithm name, used for identifying the algorithm.
+        """
+        return "photoimport"
+
+    def displayName(self) -> str:
+        """
+        Returns the translated algorithm name, which should be used for any
+        user-visible display of the algorithm name.
+        """
+        return "Import geotagged photos"
+
+    def group(self) -> str:
+        """
+        Returns the name of the group this algorithm belongs to. This string
+        should be localised.
+        """
+        return "Geocoding"
+
+    def groupId(self) -> str:
+        """
+        Returns the unique ID of the group this algorithm belongs to.
+        """
+        return "geocoding"
+
+    def shortHelpString(self):
+        return read_help("photoimport.html") or "Point layer of photos from their GPS position."
+
+    def initAlgorithm(self, config: Optional[dict[str, Any]] = None):
+        """
+        Here we define the inputs and output of the algorithm, along
+        with some other properties.
+        """
+
+        self.addParameter(
+            QgsProcessingParameterFile(
+                self.FOLDER_IN,
+                "Input folder with photos",
+                behavior=QgsProcessingParameterFile.Folder
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterEnum(
+                self.FORMATS,
+                "Photo formats",
+                options=[name for name, extensions in PHOTO_FORMATS],
+                allowMultiple=True,
+                defaultValue=[0]
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterBoolean(
+                self.RECURSIVE,
+                "Include subfolders",
+                defaultValue=True
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterNumber(
+                self.NUMBER_OF_WORKERS,
+                "Number of workers",
+                type=QgsProcessingParameterNumber.Integer,
+                minValue=1,
+                defaultValue=4
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterBoolean(
+                self.SPATIAL_INDEX,
+                "Create spatial index",
+                defaultValue=True
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterFeatureSink(
+                self.OUTPUT,
+                "Photos",
+                QgsProcessing.TypeVectorPoint
+            )
+        )
+
+        self.addOutput(QgsProcessingOutputNumber(self.IMAGES_PROCESSED, "Images processed"))
+        self.addOutput(QgsProcessingOutputNumber(self.IMAGES_IMPORTED, "Images imported"))
+        self.addOutput(QgsProcessingOutputNumber(self.IMAGES_WITHOUT_POSITION, "Images without position"))
+        self.addOutput(QgsProcessingOutputNumber(self.PHOTOS_PER_SECOND, "Photos per second"))
+
+    def processAlgorithm(
+        self,
+        parameters: dict[str, Any],
+        context: QgsProcessingContext,
+        feedback: QgsProcessingFeedback,
+    ) -> dict[str, Any]:
+        """
+        Here is where the processing itself takes place.
+        """
+
+        # Imported here like the header reader, not when QGIS starts
+        from .worker_pool import map_ordered
+
+        started = time.perf_counter()
+
+        folder_in = self.parameterAsString(parameters, self.FOLDER_IN, context)
+        formats = self.parameterAsEnums(parameters, self.FORMATS, context)
+        recursive = self.parameterAsBoolean(parameters, self.RECURSIVE, context)
+        workers = self.parameterAsInt(parameters, self.NUMBER_OF_WORKERS, context)
+        self.spatial_index = self.parameterAsBoolean(parameters, self.SPATIAL_INDEX, context)
+
+        fields = QgsFields()
+        fields.append(QgsField("path", QVariant.String))
+        fields.append(QgsField("relative_path", QVariant.String))
+        fields.append(QgsField("timestamp", QVariant.DateTime))
+        fields.append(QgsField("altitude", QVariant.Double))
+        fields.append(QgsField("direction", QVariant.Double))
+
+        # The sink is closed when it goes out of scope, before postProcessAlgorithm
+        sink, self.dest_id = self.parameterAsSink(
+            parameters,
+            self.OUTPUT,
+            context,
+            fields,
+            QgsWkbTypes.Point,
+            QgsCoordinateReferenceSystem("EPSG:4326")
+        )
+
+        # Photos are discovered while they are read
+        extensions = tuple(extension for option in formats for extension in PHOTO_FORMATS[option][1])
+        discovery = PhotoDiscovery(folder_in, extensions, recursive)
+
+        images_processed = 0
+        images_imported = 0
+        images_without_position = 0
+        features = []
+
+        # Only the headers are read, on the worker pool
+        for relative_path, path, position, taken in map_ordered(read_position, discovery, workers, feedback):
+
+            images_processed += 1
+            feedback.setProgress(int(images_processed * 100.0 / max(discovery.estimatedTotal(), 1)))
+
+            if position is None:
+                images_without_position += 1
+                continue
+
+            longitude, latitude, altitude, direction = position
+
+            feature = QgsFeature(fields)
+            feature.setGeometry(QgsGeometry.fromPointXY(QgsPointXY(longitude, latitude)))
+            feature.setAttributes([
+                path,
+                relative_path,
+                taken if isinstance(taken, QDateTime) else None,
+                altitude,
+                direction
+            ])
+            features.append(feature)
+            images_imported += 1
+
+            if len(features) >= BATCH_SIZE:
+                sink.addFeatures(features, QgsFeatureSink.FastInsert)
+                features = []
+
+        if features:
+            sink.addFeatures(features, QgsFeatureSink.FastInsert)
+
+        elapsed = time.perf_counter() - started
+
+        feedback.pushInfo(f"Images processed: {images_processed}")
+        feedback.pushInfo(f"Images imported: {images_imported}")
+        feedback.pushInfo(f"Images without position: {images_without_position}")
+
+        return {
+            self.OUTPUT: self.dest_id,
+            self.IMAGES_PROCESSED: images_processed,
+            self.IMAGES_IMPORTED: images_imported,
+            self.IMAGES_WITHOUT_POSITION: images_without_position,
+            self.PHOTOS_PER_SECOND: images_processed / elapsed if elapsed > 0 else 0
+        }
+
+    def postProcessAlgorithm(self, context: QgsProcessingContext, feedback: QgsProcessingFeedback) -> dict[str, Any]:
+        """
+        Creates the spatial index once the sink is closed and all features
+        are written. Returns no results, so the results of processAlgorithm
+        are kept.
+        """
+
+        if self.spatial_index:
+            layer = QgsProcessingUtils.mapLayerFromString(self.dest_id, context)
+            if layer is not None and layer.dataProvider().capabilities() & QgsVectorDataProvider.CreateSpatialIndex:
+                if layer.dataProvider().createSpatialIndex():
+                    feedback.pushInfo("Spatial index created")
+                else:
+                    feedback.pushWarning("Spatial index could not be created")
+
+        return {}
+
+    def createInstance(self):
+        return self.__class__()
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+
+import os
+import re
+from qgis.core import QgsMapLayer
+from qgis.PyQt.QtXml import QDomDocument
+
+class StyleCache:
+    """
+    Parsed QML files, each file is parsed once and reused for all layers
+    as long as it is not changed on disk.
+    """
+
+    def __init__(self):
+        # Path to modification time, size and parsed document
+        self.documents = {}
+
+    def document(self, path: str) -> QDomDocument:
+        """
+        Returns the parsed document of a QML file, raises OSError or
+        ValueError if it can not be read or parsed.
+        """
+
+        stat = os.stat(path)
+        cached = self.documents.get(path)
+        if cached is not None and cached[0] == (stat.st_mtime_ns, stat.st_size):
+            return cached[1]
+
+        with open(path, "rb") as qml:
+            content = qml.read()
+
+        document = QDomDocument("qgis")
+        ok, message, line, column = document.setContent(content)
+        if not ok:
+            raise ValueError(f"{message} in line {line}, column {column}")
+
+        self.documents[path] = ((stat.st_mtime_ns, stat.st_size), document)
+        return document
+
+    def clear(self):
+        self.documents.clear()
+
+def apply_style(layer: QgsMapLayer, document: QDomDocument) -> str:
+    """
+    Applies a parsed style to the layer, which is repainted with the next
+    refresh of the canvas. Returns an error message or an empty string.
+    """
+
+    ok, message = layer.importNamedStyle(document)
+    if not ok:
+        return message or "style not applied"
+
+    layer.emitStyleChanged()
+    layer.triggerRepaint(True)
+    return ""
+
+def styles_by_name(folder: str) -> dict[str, str]:
+    """
+    Returns the QML files of a folder by their name without suffix in
+    lower case, to be matched with the names of the layers.
+    """
+
+    styles = {}
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            stem, extension = os.path.splitext(entry.name)
+            if entry.is_file() and extension.lower() == ".qml":
+                styles[stem.casefold()] = entry.path
+    return styles
+
+def style_file_name(name: str, used: set) -> str:
+    """
+    Returns a file name for the style of a layer, characters not allowed in
+    file names are replaced and duplicate layer names get a number.
+    """
+
+    stem = re.sub(r'[\\/:*?"<>|]', "_", name).strip() or "layer"
+    file_name = f"{stem}.qml"
+    number = 2
+    while file_name.casefold() in used:
+        file_name = f"{stem} ({number}).qml"
+        number += 1
+
+    used.add(file_name.casefold())
+    return file_name
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+
+import json
+import os
+from typing import Optional
+
+class RunJournal:
+    """
+    Journal of the photos finished by a run, kept in the output folder.
+
+    Every photo written is appended as one JSON line together with size and
+    modification time of the source, the settings of the run and the
+    location the photo was matched to. A resumed run skips photos whose
+    source, settings and output are unchanged.
+    """
+
+    FILE_NAME = ".photocoding_journal.jsonl"
+
+    def __init__(self, folder: str, settings: dict, resume: bool = False):
+        self.path = os.path.join(folder, self.FILE_NAME)
+        self.settings = settings
+        self.records = {}
+
+        if resume and os.path.exists(self.path):
+            with open(self.path, encoding="utf-8") as journal:
+                for line in journal:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # The last line is incomplete after a crash
+                        continue
+                    self.records[record["output"]] = record
+
+        # Start a new journal unless resuming, then keep appending
+        self.journal = open(self.path, "a" if resume else "w", encoding="utf-8")
+
+    def isDone(self, source: str, stat: os.stat_result, output: str) -> bool:
+        """
+        Returns if the output was written from the unchanged source with the
+        same settings by a previous run.
+        """
+
+        record = self.records.get(output)
+        return (
+            record is not None
+            and record["source"] == source
+            and record["size"] == stat.st_size
+            and record["mtime"] == stat.st_mtime_ns
+            and record["settings"] == self.settings
+            and os.path.exists(output)
+        )
+
+    def point(self, output: str) -> Optional[int]:
+        """
+        Returns the id of the point a finished output was matched to.
+        """
+        record = self.records.get(output)
+        return record["point"] if record is not None else None
+
+    def location(self, output: str) -> Optional[dict]:
+        """
+        Returns the location of a finished output, with timestamp, x and y
+        in WGS84, time delta and altitude. None for journals written before
+        the location was recorded.
+        """
+        record = self.records.get(output)
+        return record.get("location") if record is not None else None
+
+    def record(self, source: str, stat: os.stat_result, output: str, point: int, location: Optional[dict] = None):
+        """
+        Appends a finished photo to the journal.
+        """
+
+        record = {
+            "source": source,
+            "size": stat.st_size,
+            "mtime": stat.st_mtime_ns,
+            "output": output,
+            "point": point,
+            "location": location,
+            "settings": self.settings
+        }
+        self.records[output] = record
+
+        # Flush every line, so the journal survives a crash of QGIS
+        self.journal.write(json.dumps(record) + "\n")
+        self.journal.flush()
+
+    def close(self):
+        self.journal.close()
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+
+import time
+from contextlib import contextmanager
+from typing import Iterable, Iterator
+
+class StageTimer:
+    """
+    Sums up the time spent in the stages of an algorithm.
+
+    Stages running on worker threads are measured there and added with
+    add(), so their time is the sum over all workers.
+    """
+
+    def __init__(self):
+        self.seconds = {}
+
+    def add(self, stage: str, seconds: float):
+        self.seconds[stage] = self.seconds.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def measure(self, stage: str):
+        """
+        Context manager adding the time spent in its block to the stage.
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - started)
+
+    def iterate(self, stage: str, iterable: Iterable) -> Iterator:
+        """
+        Yields the items of the iterable and adds the time spent producing
+        them to the stage, e.g. for a lazily scanned folder.
+        """
+        iterator = iter(iterable)
+        while True:
+            started = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                self.add(stage, time.perf_counter() - started)
+            yield item
@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+
+import math
+import os
+import sqlite3
+import time
+from typing import Optional
+from urllib.parse import urlsplit
+from PyQt5.QtCore import QStandardPaths, QUrl
+from PyQt5.QtNetwork import QNetworkRequest
+from qgis.core import QgsBlockingNetworkRequest, QgsRectangle, QgsTask
+
+DEFAULT_TILE_URL = "https://tile.openstreetmap.org/{z}/{x}/{y}.png"
+
+# Tile servers whose usage policy forbids bulk downloads for offline use
+NO_PREFETCH_HOSTS = ("tile.openstreetmap.org",)
+
+# Latitude limit of the web mercator tiles
+MAX_LATITUDE = 85.0511287798
+
+MAX_ZOOM = 19
+
+class TileCache:
+    """
+    MBTiles file with the tiles of the basemap, which can be added to QGIS
+    as raster layer for offline use.
+
+    Besides the columns of the MBTiles specification, the tiles table keeps
+    the size and the time of the last download or prefetch of each tile.
+    QGIS reads the file directly when rendering, so rendering does not
+    count as use. The least recently prefetched tiles are removed when the
+    file grows beyond the maximum size.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 500 * 2 ** 20):
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        self.max_bytes = max_bytes
+        self.connection = sqlite3.connect(path, timeout=30)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS metadata (name TEXT PRIMARY KEY, value TEXT)")
+        self.connection.execute(
+            """CREATE TABLE IF NOT EXISTS tiles (
+                zoom_level INTEGER NOT NULL,
+                tile_column INTEGER NOT NULL,
+                tile_row INTEGER NOT NULL,
+                tile_data BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                accessed REAL NOT NULL
+            )"""
+        )
+        self.connection.execute("CREATE UNIQUE INDEX IF NOT EXISTS tile_index ON tiles (zoom_level, tile_column, tile_row)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS tiles_accessed ON tiles (accessed)")
+        self.connection.executemany(
+            "INSERT OR IGNORE INTO metadata VALUES (?, ?)",
+            [
+                ("name", "Maptools basemap"),
+                ("format", "png"),
+                ("type", "baselayer"),
+                ("minzoom", "0"),
+                ("maxzoom", str(MAX_ZOOM)),
+                ("bounds", f"-180,{-MAX_LATITUDE},180,{MAX_LATITUDE}"),
+            ]
+        )
+        self.connection.commit()
+
+    @staticmethod
+    def defaultPath() -> str:
+        """
+        Returns the path of the cache in the user cache directory.
+        """
+        cache_dir = QStandardPaths.writableLocation(QStandardPaths.CacheLocation)
+        return os.path.join(cache_dir, "maptools", "tiles.mbtiles")
+
+    def touch(self, z: int, x: int, y: int) -> bool:
+        """
+        Returns if the tile is cached and marks it as prefetched now.
+        """
+
+        cursor = self.connection.execute(
+            "UPDATE tiles SET accessed = ? WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?",
+            (time.time(), z, x, tms_row(z, y))
+        )
+        return cursor.rowcount > 0
+
+    def get(self, z: int, x: int, y: int) -> Optional[bytes]:
+        row = self.connection.execute(
+            "SELECT tile_data FROM tiles WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?",
+            (z, x, tms_row(z, y))
+        ).fetchone()
+        return None if row is None else bytes(row[0])
+
+    def put(self, z: int, x: int, y: int, data: bytes):
+        self.connection.execute(
+            "INSERT OR REPLACE INTO tiles VALUES (?, ?, ?, ?, ?, ?)",
+            (z, x, tms_row(z, y), sqlite3.Binary(data), len(data), time.time())
+        )
+
+    def commit(self):
+        self.connection.commit()
+
+    def clear(self):
+        """
+        Removes all tiles.
+        """
+        self.connection.execute("DELETE FROM tiles")
+        self.connection.commit()
+
+    def close(self):
+        """
+        Drops the least recently prefetched tiles beyond the maximum size,
+        writes the changes and closes the cache.
+        """
+
+        self.connection.execute(
+            """DELETE FROM tiles WHERE rowid IN (
+                SELECT rowid FROM (
+                    SELECT rowid, SUM(size) OVER (ORDER BY accessed DESC, rowid) AS total FROM tiles
+                ) WHERE total > ?
+            )""",
+            (self.max_bytes,)
+        )
+        self.connection.commit()
+        self.connection.close()
+
+def allows_prefetch(url: str) -> bool:
+    """
+    Returns if the tiles of the URL may be prefetched, which is not the case
+    for the OpenStreetMap tile servers and their subdomains.
+    """
+    host = (urlsplit(url).hostname or "").lower()
+    return not any(host == name or host.endswith("." + name) for name in NO_PREFETCH_HOSTS)
+
+def tms_row(z: int, y: int) -> int:
+    """
+    Returns the row of a XYZ tile in the TMS scheme of MBTiles.
+    """
+    return (1 << z) - 1 - y
+
+def tile_range(extent: QgsRectangle, z: int) -> tuple[int, int, int, int]:
+    """
+    Returns the first and last column and row of the XYZ tiles covering an
+    extent in WGS84 at a zoom level.
+    """
+
+    n = 1 << z
+
+    def column(lon):
+        return min(n - 1, max(0, int((lon + 180.0) / 360.0 * n)))
+
+    def row(lat):
+        lat = math.radians(min(MAX_LATITUDE, max(-MAX_LATITUDE, lat)))
+        return min(n - 1, max(0, int((1.0 - math.asinh(math.tan(lat)) / math.pi) / 2.0 * n)))
+
+    return column(extent.xMinimum()), column(extent.xMaximum()), row(extent.yMaximum()), row(extent.yMinimum())
+
+def tile_count(extent: QgsRectangle, zoom_min: int, zoom_max: int) -> int:
+    count = 0
+    for z in range(zoom_min, zoom_max + 1):
+        x_min, x_max, y_min, y_max = tile_range(extent, z)
+        count += (x_max - x_min + 1) * (y_max - y_min + 1)
+    return count
+
+def zoom_for_scale(scale: float) -> int:
+    """
+    Returns the zoom level of the tiles closest to a map scale.
+    """
+    if scale <= 0:
+        return 0
+    return min(MAX_ZOOM, max(0, round(math.log2(559082264.0 / scale))))
+
+class TilePrefetchTask(QgsTask):
+    """
+    Downloads the tiles of an extent for a range of zoom levels into the
+    tile cache. Tiles already cached are not downloaded again. Only used with
+    a tile server configured by the user, see allows_prefetch.
+    """
+
+    def __init__(self, cache_path: str, url: str, extent: QgsRectangle, zoom_min: int, zoom_max: int, max_bytes: int):
+        super().__init__(f"Prefetch tiles for zoom {zoom_min} to {zoom_max}", QgsTask.CanCancel)
+
+        self.cache_path = cache_path
+        self.url = url
+        self.extent = QgsRectangle(extent)
+        self.zoom_min = zoom_min
+        self.zoom_max = zoom_max
+        self.max_bytes = max_bytes
+
+        self.total = tile_count(extent, zoom_min, zoom_max)
+        self.downloaded = 0
+        self.cached = 0
+        self.failed = 0
+        self.error = None
+
+    def run(self) -> bool:
+        # The connection belongs to the thread of the task
+        cache = TileCache(self.cache_path, self.max_bytes)
+        current = 0
+
+        try:
+            for z in range(self.zoom_min, self.zoom_max + 1):
+                x_min, x_max, y_min, y_max = tile_range(self.extent, z)
+                for x in range(x_min, x_max + 1):
+                    for y in range(y_min, y_max + 1):
+                        if self.isCanceled():
+                            return False
+
+                        if cache.touch(z, x, y):
+                            self.cached += 1
+                        else:
+                            data = self.fetch(z, x, y)
+                            if data:
+                                cache.put(z, x, y, data)
+                                self.downloaded += 1
+                            else:
+                                self.failed += 1
+
+                        current += 1
+                        if current % 100 == 0:
+                            cache.commit()
+                        self.setProgress(current * 100.0 / self.total)
+
+        except sqlite3.Error as error:
+            self.error = str(error)
+            return False
+
+        finally:
+            cache.close()
+
+        return True
+
+    def fetch(self, z: int, x: int, y: int) -> Optional[bytes]:
+        url = self.url.replace("{z}", str(z)).replace("{x}", str(x)).replace("{y}", str(y))
+
+        request = QgsBlockingNetworkRequest()
+        if request.get(QNetworkRequest(QUrl(url))) != QgsBlockingNetworkRequest.NoError:
+            self.error = request.errorMessage()
+            return None
+
+        return bytes(request.reply().content())
@@ -0,0 +1,264 @@
+# -*- coding: utf-8 -*-
+
+import math
+from array import array
+import threading
+import time
+from typing import Callable, Hashable, Optional, Sequence
+import numpy as np
+from PyQt5.QtCore import QDateTime
+from qgis.core import (
+    Qgis,
+    QgsCoordinateReferenceSystem,
+    QgsCoordinateTransform,
+    QgsCoordinateTransformContext,
+    QgsFeatureRequest,
+    QgsFeatureSource,
+    QgsLineString,
+    QgsPointXY,
+    QgsProcessingFeedback
+)
+
+from .stage_timer import StageTimer
+
+class TrackMatches:
+    """
+    Points matched to a list of photo times, as arrays in the order of the
+    photos. Positions are in WGS84, altitudes NaN if unknown.
+    """
+
+    def __init__(self, found, ids, xs, ys, zs, deltas, multiple):
+        self.found = found
+        self.ids = ids
+        self.xs = xs
+        self.ys = ys
+        self.zs = zs
+        self.deltas = deltas
+        self.multiple = multiple
+
+    def __len__(self) -> int:
+        return len(self.found)
+
+    def point(self, number: int) -> QgsPointXY:
+        return QgsPointXY(float(self.xs[number]), float(self.ys[number]))
+
+    def altitude(self, number: int) -> Optional[float]:
+        """
+        Returns the altitude of the match or None if the track has none.
+        """
+        z = float(self.zs[number])
+        return None if math.isnan(z) else z
+
+    def delta(self, number: int) -> float:
+        """
+        Returns the time from the photo to the closest point in seconds.
+        """
+        return float(self.deltas[number]) / 1000.0
+
+class TrackIndex:
+    """
+    Points of a track sorted by their timestamp.
+
+    The timestamp field and the position are read once into typed arrays
+    when the index is built, other attributes are never fetched. Afterwards
+    the photos are resolved all at once by a binary search with NumPy
+    instead of a scan over the layer per photo. The positions are reprojected to WGS84
+    in one batch while building, so matching needs no transformation.
+    """
+
+    def __init__(
+        self,
+        source: QgsFeatureSource,
+        timestamp_field: str,
+        transform_context: QgsCoordinateTransformContext,
+        feedback: Optional[QgsProcessingFeedback] = None,
+        timer: Optional[StageTimer] = None,
+    ):
+        timer = timer if timer is not None else StageTimer()
+        started = time.perf_counter()
+
+        # Compact columns instead of features, for wide layers with many points
+        times = array("q")
+        ids = array("q")
+        xs = array("d")
+        ys = array("d")
+        zs = array("d")
+
+        # Only fetch the timestamp besides the geometry
+        request = QgsFeatureRequest()
+        request.setSubsetOfAttributes([timestamp_field], source.fields())
+
+        for feature in source.getFeatures(request):
+            if feedback is not None and feedback.isCanceled():
+                break
+
+            # Points without a valid timestamp or position can never match a photo
+            value = feature[timestamp_field]
+            if not isinstance(value, QDateTime) or not value.isValid():
+                continue
+            geometry = feature.geometry()
+            if geometry.isEmpty():
+                continue
+
+            vertex = geometry.vertexAt(0)
+            times.append(value.toMSecsSinceEpoch())
+            ids.append(feature.id())
+            xs.append(vertex.x())
+            ys.append(vertex.y())
+            zs.append(vertex.z() if vertex.is3D() else math.nan)
+
+        # Sort by time and feature id, so equal timestamps resolve deterministically
+        times = np.frombuffer(times, dtype=np.int64)
+        ids = np.frombuffer(ids, dtype=np.int64)
+        order = np.lexsort((ids, times))
+
+        self.times = times[order]
+        self.ids = ids[order]
+        self.xs = np.frombuffer(xs, dtype=np.float64)[order]
+        self.ys = np.frombuffer(ys, dtype=np.float64)[order]
+        self.zs = np.frombuffer(zs, dtype=np.float64)[order]
+
+        timer.add("index", time.perf_counter() - started)
+
+        # Reproject all positions at once, the Z values stay untouched
+        with timer.measure("transform"):
+            self.reproject(source.sourceCrs(), transform_context)
+
+    def reproject(self, crs: QgsCoordinateReferenceSystem, transform_context: QgsCoordinateTransformContext):
+        """
+        Transforms the positions from the given CRS to WGS84.
+        """
+        wgs84 = QgsCoordinateReferenceSystem("EPSG:4326")
+        if len(self.times) and crs != wgs84:
+            transform = QgsCoordinateTransform(crs, wgs84, transform_context)
+            track = QgsLineString(self.xs.tolist(), self.ys.tolist())
+            track.transform(transform, Qgis.TransformDirection.Forward, False)
+            self.xs = np.array(track.xVector(), dtype=np.float64)
+            self.ys = np.array(track.yVector(), dtype=np.float64)
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def match(self, msecs: Sequence[int], tolerance: int = 0) -> TrackMatches:
+        """
+        Matches each time in milliseconds since epoch to the closest point
+        within the tolerance (also in milliseconds). On a tie the earlier
+        point wins, of points with the same time the one with the lowest id.
+        """
+
+        msecs = np.asarray(msecs, dtype=np.int64)
+        count = len(self.times)
+        if count == 0:
+            return self._empty(len(msecs))
+
+        after = np.searchsorted(self.times, msecs, side="left")
+        before = np.clip(after - 1, 0, count - 1)
+        after_clipped = np.clip(after, 0, count - 1)
+
+        # Distance to the points right before and at or after the time
+        delta_before = np.where(after > 0, msecs - self.times[before], np.inf)
+        delta_after = np.where(after < count, self.times[after_clipped] - msecs, np.inf)
+
+        # First point of the run of equal timestamps right before
+        before = np.searchsorted(self.times, self.times[before], side="left")
+
+        use_before = delta_before <= delta_after
+        positions = np.where(use_before, before, after_clipped)
+        deltas = np.minimum(delta_before, delta_after)
+        found = deltas <= tolerance
+
+        candidates = (
+            np.searchsorted(self.times, msecs + tolerance, side="right")
+            - np.searchsorted(self.times, msecs - tolerance, side="left")
+        )
+
+        return TrackMatches(
+            found,
+            self.ids[positions],
+            self.xs[positions],
+            self.ys[positions],
+            self.zs[positions],
+            np.where(use_before, -deltas, deltas),
+            found & (candidates > 1)
+        )
+
+    def interpolate(self, msecs: Sequence[int], max_gap: int) -> TrackMatches:
+        """
+        Interpolates the positions at the given times in milliseconds since
+        epoch linearly between the points right before and after. Times
+        between points more than max_gap milliseconds apart are not matched,
+        times equal to a point always are. The id is the one of the closer
+        point.
+        """
+
+        msecs = np.asarray(msecs, dtype=np.int64)
+        count = len(self.times)
+        if count == 0:
+            return self._empty(len(msecs))
+
+        # Last point at or before and first point after the time
+        right = np.searchsorted(self.times, msecs, side="right")
+        left = np.clip(right - 1, 0, count - 1)
+        right_clipped = np.clip(right, 0, count - 1)
+
+        exact = (right > 0) & (self.times[left] == msecs)
+
+        # Of points with the same time the first one is used
+        first = np.searchsorted(self.times, self.times[left], side="left")
+        left = np.where(exact, first, left)
+        gap = self.times[right_clipped] - self.times[left]
+        between = (right > 0) & (right < count) & (gap <= max_gap)
+        found = exact | between
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            fraction = np.where(between & (gap > 0), (msecs - self.times[left]) / gap, 0.0)
+        fraction = np.where(exact, 0.0, fraction)
+
+        # Exact matches take the point as it is, so a next point without Z
+        # does not turn the altitude into NaN
+        xs = np.where(exact, self.xs[left], self.xs[left] + fraction * (self.xs[right_clipped] - self.xs[left]))
+        ys = np.where(exact, self.ys[left], self.ys[left] + fraction * (self.ys[right_clipped] - self.ys[left]))
+        zs = np.where(exact, self.zs[left], self.zs[left] + fraction * (self.zs[right_clipped] - self.zs[left]))
+
+        # Report the closer point, the left one is the point the position
+        # was interpolated from
+        use_left = exact | (fraction <= 0.5)
+        positions = np.where(use_left, left, right_clipped)
+        deltas = self.times[positions] - msecs
+
+        return TrackMatches(found, self.ids[positions], xs, ys, zs, deltas, np.zeros(len(msecs), dtype=bool))
+
+    def _empty(self, count: int) -> TrackMatches:
+        return TrackMatches(
+            np.zeros(count, dtype=bool),
+            np.zeros(count, dtype=np.int64),
+            np.full(count, np.nan),
+            np.full(count, np.nan),
+            np.full(count, np.nan),
+            np.zeros(count, dtype=np.int64),
+            np.zeros(count, dtype=bool)
+        )
+
+class TrackIndexCache:
+    """
+    Track indexes shared between several runs, e.g. the jobs of a batch
+    using the same points layer. Each index is built only once, also when
+    several jobs ask for it at the same time.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.key_locks = {}
+        self.indexes = {}
+
+    def get(self, key: Hashable, build: Callable[[], TrackIndex]) -> TrackIndex:
+        """
+        Returns the index for the key and builds it if it is not cached yet.
+        """
+        with self.lock:
+            key_lock = self.key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            if key not in self.indexes:
+                self.indexes[key] = build()
+            return self.indexes[key]
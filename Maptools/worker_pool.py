@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterable, Iterator, Optional
+from qgis.core import QgsFeedback
+
+def map_ordered(
+    function: Callable[[Any], Any],
+    items: Iterable[Any],
+    workers: int = 1,
+    feedback: Optional[QgsFeedback] = None,
+) -> Iterator[Any]:
+    """
+    Applies the function to all items on a pool of worker threads and yields
+    the results in the order of the items.
+
+    Only a few items per worker are submitted ahead, so cancelling through
+    the feedback stops the work quickly. With a single worker everything
+    runs in the calling thread.
+    """
+
+    if workers <= 1:
+        for item in items:
+            if feedback is not None and feedback.isCanceled():
+                return
+            yield function(item)
+        return
+
+    pending = deque()
+    items = iter(items)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        try:
+            for item in items:
+                pending.append(executor.submit(function, item))
+                if len(pending) < workers * 4:
+                    continue
+
+                if feedback is not None and feedback.isCanceled():
+                    return
+                yield pending.popleft().result()
+
+            while pending:
+                if feedback is not None and feedback.isCanceled():
+                    return
+                yield pending.popleft().result()
+
+        finally:
+            # Drop everything not started yet, e.g. after cancelling
+            for future in pending:
+                future.cancel()
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+
+from typing import Optional
+from qgis.core import QgsPointXY
+
+XMP_TEMPLATE = """<?xpacket begin="\ufeff" id="W5M0MpCehiHzreSzNTczkc9d"?>
+<x:xmpmeta xmlns:x="adobe:ns:meta/">
+ <rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#">
+  <rdf:Description rdf:about=""
+    xmlns:exif="http://ns.adobe.com/exif/1.0/">
+   <exif:GPSVersionID>2.3.0.0</exif:GPSVersionID>
+   <exif:GPSLatitude>{latitude}</exif:GPSLatitude>
+   <exif:GPSLongitude>{longitude}</exif:GPSLongitude>{altitude}
+  </rdf:Description>
+ </rdf:RDF>
+</x:xmpmeta>
+<?xpacket end="w"?>
+"""
+
+ALTITUDE_TEMPLATE = """
+   <exif:GPSAltitudeRef>{reference}</exif:GPSAltitudeRef>
+   <exif:GPSAltitude>{altitude}/1000</exif:GPSAltitude>"""
+
+def coordinate(value: float, positive: str, negative: str) -> str:
+    """
+    Formats a coordinate as XMP GPSCoordinate, e.g. "51,2.123456N".
+    """
+    degrees = int(abs(value))
+    minutes = (abs(value) - degrees) * 60
+    return f"{degrees},{minutes:.6f}{positive if value >= 0 else negative}"
+
+def write_sidecar(path: str, point: QgsPointXY, altitude: Optional[float] = None):
+    """
+    Writes the position of a photo to a XMP sidecar file.
+    """
+
+    altitude_tags = ""
+    if altitude is not None:
+        altitude_tags = ALTITUDE_TEMPLATE.format(
+            reference=1 if altitude < 0 else 0,
+            altitude=int(round(abs(altitude) * 1000))
+        )
+
+    with open(path, "w", encoding="utf-8") as sidecar:
+        sidecar.write(XMP_TEMPLATE.format(
+            latitude=coordinate(point.y(), "N", "S"),
+            longitude=coordinate(point.x(), "E", "W"),
+            altitude=altitude_tags
+        ))
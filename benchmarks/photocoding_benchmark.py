@@ -0,0 +1,249 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the "Correlation of photos" algorithm.
+
+Generates synthetic JPEGs with EXIF timestamps and a point layer with a
+DateTime field, runs maptools:photocoding through the processing API in an
+offscreen QgsApplication and writes photos per second, peak memory and
+the time per stage to a JSON file. Each number of photos runs in its own
+process, so the peak memory belongs to that size only.
+
+Usage, from the root of the repository:
+
+    python3 benchmarks/photocoding_benchmark.py --sizes 1000 10000 100000
+
+Compare the JSON files of several versions only if they were measured on
+the same machine.
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import resource
+import shutil
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from qgis.core import (
+    Qgis,
+    QgsApplication,
+    QgsFeature,
+    QgsGeometry,
+    QgsPoint,
+    QgsProcessingContext,
+    QgsProcessingFeedback,
+    QgsVectorLayer
+)
+from qgis.PyQt.QtCore import QBuffer, QByteArray, QDateTime, QIODevice
+from qgis.PyQt.QtGui import QColor, QImage
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Maptools.maptools_provider import MaptoolsAlgorithms
+
+START = datetime.datetime(2024, 6, 1, 8, 0, 0)
+
+def peak_rss() -> int:
+    """
+    Returns the peak resident set size of the process in bytes, which is
+    the peak of the single size run by the process.
+    """
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return usage if sys.platform == "darwin" else usage * 1024
+
+def exif_segment(taken: datetime.datetime) -> bytes:
+    """
+    Returns an APP1 segment with DateTime and DateTimeOriginal.
+    """
+    value = taken.strftime("%Y:%m:%d %H:%M:%S").encode("ascii") + b"\x00"
+
+    ifd0_size = 2 + 2 * 12 + 4
+    exif_offset = 8 + ifd0_size + len(value)
+    exif_size = 2 + 12 + 4
+
+    ifd0 = struct.pack("<H", 2)
+    ifd0 += struct.pack("<HHII", 0x0132, 2, len(value), 8 + ifd0_size)
+    ifd0 += struct.pack("<HHII", 0x8769, 4, 1, exif_offset)
+    ifd0 += struct.pack("<I", 0) + value
+
+    exif = struct.pack("<H", 1)
+    exif += struct.pack("<HHII", 0x9003, 2, len(value), exif_offset + exif_size)
+    exif += struct.pack("<I", 0) + value
+
+    payload = b"Exif\x00\x00" + b"II*\x00" + struct.pack("<I", 8) + ifd0 + exif
+    return b"\xff\xe1" + struct.pack(">H", len(payload) + 2) + payload
+
+def base_jpeg() -> bytes:
+    """
+    Returns a small JPEG without EXIF block.
+    """
+    image = QImage(320, 240, QImage.Format_RGB32)
+    image.fill(QColor(90, 140, 60))
+
+    data = QByteArray()
+    buffer = QBuffer(data)
+    buffer.open(QIODevice.WriteOnly)
+    image.save(buffer, "JPG", 85)
+    buffer.close()
+    return bytes(data)
+
+def generate_photos(folder: str, count: int, step: int):
+    """
+    Writes count photos taken every step seconds.
+    """
+    jpeg = base_jpeg()
+    for number in range(count):
+        taken = START + datetime.timedelta(seconds=number * step)
+        with open(os.path.join(folder, f"IMG_{number:06d}.jpg"), "wb") as photo:
+            # The EXIF block follows the start of image marker
+            photo.write(jpeg[:2] + exif_segment(taken) + jpeg[2:])
+
+def generate_points(count: int) -> QgsVectorLayer:
+    """
+    Returns a memory layer with a point every second in UTM zone 33N.
+    """
+    layer = QgsVectorLayer("PointZ?crs=EPSG:25833&field=time:datetime", "track", "memory")
+
+    features = []
+    for number in range(count):
+        taken = START + datetime.timedelta(seconds=number)
+        feature = QgsFeature(layer.fields())
+        feature.setGeometry(QgsGeometry(QgsPoint(411000 + number * 0.5, 5655000 + number * 0.25, 120 + number % 50)))
+        feature.setAttribute(0, QDateTime(taken))
+        features.append(feature)
+
+    layer.dataProvider().addFeatures(features)
+    return layer
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+def run(size: int, points_per_photo: int, workers: int) -> dict:
+    """
+    Runs the benchmark for one number of photos.
+    """
+    stages = {}
+    folder = tempfile.mkdtemp(prefix="maptools_benchmark_")
+    folder_in = os.path.join(folder, "in")
+    folder_out = os.path.join(folder, "out")
+    os.makedirs(folder_in)
+
+    try:
+        started = time.perf_counter()
+        generate_photos(folder_in, size, points_per_photo)
+        stages["generate_photos"] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        points = generate_points(size * points_per_photo)
+        stages["generate_points"] = time.perf_counter() - started
+
+        algorithm = QgsApplication.processingRegistry().createAlgorithmById("maptools:photocoding")
+        context = QgsProcessingContext()
+        feedback = QgsProcessingFeedback()
+        parameters = {
+            "POINTS": points,
+            "POINTS_TIMESTAMP": "time",
+            "OFFSET": 0,
+            "ELEVATION_OFFSET": 0,
+            "FOLDER_IN": folder_in,
+            "FOLDER_OUT": folder_out,
+            "NUMBER_OF_WORKERS": workers,
+            "USE_CACHE": False
+        }
+
+        started = time.perf_counter()
+        results, ok = algorithm.run(parameters, context, feedback)
+        stages["algorithm"] = time.perf_counter() - started
+
+        if not ok:
+            raise RuntimeError(f"Algorithm failed for {size} photos")
+
+        # Stages measured by the algorithm itself, summed over the workers
+        for key, value in results.items():
+            if key.startswith("TIME_"):
+                stages[key[5:].lower()] = value
+
+        return {
+            "photos": size,
+            "points": size * points_per_photo,
+            "workers": workers,
+            "photos_per_second": size / stages["algorithm"] if stages["algorithm"] else None,
+            "images_referenced": results["IMAGES_REFERENCED"],
+            "peak_rss_bytes": peak_rss(),
+            "stages_seconds": stages
+        }
+
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+def run_in_process(size: int, points_per_photo: int, workers: int) -> dict:
+    """
+    Runs the benchmark for one number of photos in a new process and
+    returns its result.
+    """
+    output = subprocess.check_output([
+        sys.executable, os.path.abspath(__file__),
+        "--run-size", str(size),
+        "--points-per-photo", str(points_per_photo),
+        "--workers", str(workers)
+    ])
+    # The result is the last line, QGIS may print before
+    return json.loads(output.decode().strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000], help="numbers of photos")
+    parser.add_argument("--points-per-photo", type=int, default=10, help="points of the track per photo")
+    parser.add_argument("--workers", type=int, default=1, help="number of workers of the algorithm")
+    parser.add_argument("--output", default="benchmark_results.json", help="JSON file for the results")
+    parser.add_argument("--run-size", type=int, help=argparse.SUPPRESS)
+    arguments = parser.parse_args()
+
+    if arguments.run_size is not None:
+        application = QgsApplication([], False)
+        application.initQgis()
+        QgsApplication.processingRegistry().addProvider(MaptoolsAlgorithms())
+
+        try:
+            result = run(arguments.run_size, arguments.points_per_photo, arguments.workers)
+        finally:
+            application.exitQgis()
+
+        print(json.dumps(result))
+        return
+
+    results = []
+    for size in arguments.sizes:
+        result = run_in_process(size, arguments.points_per_photo, arguments.workers)
+        print(f"{size} photos: {result['photos_per_second']:.1f} photos/s, "
+              f"peak RSS {result['peak_rss_bytes'] / 2 ** 20:.0f} MiB")
+        results.append(result)
+
+    report = {
+        "benchmark": "photocoding",
+        "date": datetime.datetime.now().isoformat(timespec="seconds"),
+        "revision": git_revision(),
+        "qgis_version": Qgis.version(),
+        "python_version": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "results": results
+    }
+    with open(arguments.output, "w", encoding="utf-8") as output:
+        json.dump(report, output, indent=2)
+
+if __name__ == "__main__":
+    main()